@@ -1,21 +1,28 @@
 from __future__ import annotations
 
-import aiohttp
 import asyncio
-import glob
 import os
-import shutil
 import sys
+import time
 import wx
 from direct.directnotify.DirectNotifyGlobal import directNotify
 from direct.showbase.ShowBase import ShowBase
-from panda3d.core import Multifile, Filename, loadPrcFile, loadPrcFileData, TextProperties, TextPropertiesManager
-from pathlib import PurePosixPath
-from typing import Dict
+from panda3d.core import loadPrcFile, loadPrcFileData, TextProperties, TextPropertiesManager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple
 from wx.adv import SplashScreen, SPLASH_CENTER_ON_SCREEN
 
 from src.base import DPDKGlobal
+from src.base.Localizer import LocalizerFetcher, LocalizerSnapshot, parseLocalizerFile, LOCALIZER_BASE_URL, LOCALIZER_FILES
+from src.base.ResourceExtractor import ResourceExtractor, LazyResourceExtractor, findClientPaks
+from src.base.ResourceMounter import ResourceMounter
+from src.base.StartupProfiler import StartupProfiler
+from src.base.SubfileCatalog import SubfileCatalog
+from src.base.TempCleanup import discardDirectory, sweepTombstones
+from src.datapack.DataPackGlobals import ResourceMode
+from src.datapack.DataPackManager import DataPackManager
 from src.ott.Settings import Settings
+from src.pandaview.Cog import CogBodyPool
 from src.window.SDKInterface import WxPandaShell
 
 
@@ -25,142 +32,243 @@ class DPDKBase(WxPandaShell):
 
     # noinspection PyMissingConstructor
     def __init__(self):
-        loadPrcFile('sdk.prc')
-        base = ShowBase(False, windowType = 'none')
+        self.profiler = StartupProfiler()
+        self.firstFrameRendered: bool = False
+        with self.profiler.phase('loadPrcFile'):
+            loadPrcFile('sdk.prc')
+        with self.profiler.phase('ShowBase'):
+            base = ShowBase(False, windowType = 'none')
         self.sb = base
         # a much simpler way to hold localizer keys and strings
         self.localizer: Dict[str, str] = {}
         self.gameResourcesPath: str = 'sdk/temp/realms_resources'
         self.activePack: str | None = None
         self.settings = Settings('settings.toml')
-        self.wxApp = wx.App(redirect = False)
-        self.wxApp.SetAppName("Toontown Realms Data Pack Development Kit")
-        img = wx.Bitmap('sdk/assets/ttsdk_i_splash.png', wx.BITMAP_TYPE_PNG)
-        self.splash = wx.adv.SplashScreen(img, SPLASH_CENTER_ON_SCREEN, 99999, None)
-
-        if 'realms_client_directory' not in self.settings:
-            if os.path.exists(os.path.expandvars("%localappdata%\\Toontown Realms\\")):
-                gamePath = os.path.expandvars("%localappdata%\\Toontown Realms\\")
-            else:
-                clientInstallDir = wx.DirDialog(None, "Select your Toontown Realms Installation Directory", defaultPath = os.path.expandvars("%localappdata%\\"))
-                if clientInstallDir.ShowModal() == wx.ID_OK:
-                    gamePath = clientInstallDir.GetPath()
+        sweepTombstones('sdk/temp')
+        with self.profiler.phase('wx.App and splash'):
+            self.wxApp = wx.App(redirect = False)
+            self.wxApp.SetAppName("Toontown Realms Data Pack Development Kit")
+            img = wx.Bitmap('sdk/assets/ttsdk_i_splash.png', wx.BITMAP_TYPE_PNG)
+            self.splash = wx.adv.SplashScreen(img, SPLASH_CENTER_ON_SCREEN, 99999, None)
+
+        # Anything startup changes in the settings is saved once
+        with self.settings.batch():
+            if 'realms_client_directory' not in self.settings:
+                if os.path.exists(os.path.expandvars("%localappdata%\\Toontown Realms\\")):
+                    gamePath = os.path.expandvars("%localappdata%\\Toontown Realms\\")
                 else:
-                    sys.exit()
-            self.settings['realms_client_directory'] = gamePath
-        if not self.settings.get('dont_update_temp_files', False) or not self.settings.get('use_dev_resources', False):
-            self.extractGameClient()
-
+                    clientInstallDir = wx.DirDialog(None, "Select your Toontown Realms Installation Directory", defaultPath = os.path.expandvars("%localappdata%\\"))
+                    if clientInstallDir.ShowModal() == wx.ID_OK:
+                        gamePath = clientInstallDir.GetPath()
+                    else:
+                        sys.exit()
+                self.settings['realms_client_directory'] = gamePath
+        self.resourceMode: str = self.settings.get('resource_mode', ResourceMode.EXTRACT)
+        self.catalog: SubfileCatalog | None = None
         if self.settings.get('use_dev_resources', False):
             if self.settings.get('dev_directory', None) is None:
                 self.notify.error('You have use_dev_resources enabled, but did not specify a dev_directory.')
             self.gameResourcesPath = f'{self.settings.get("dev_directory")}\\resources\\'
+            # Dev resources are plain files on disk
+            self.resourceMode = ResourceMode.EXTRACT
             loadPrcFileData('settings: dev resources', f'model-path {self.gameResourcesPath}')
 
-            self.fetchLocalizerStringsFromDev()
-        else:
-            loop = asyncio.get_event_loop()
-            loop.run_until_complete(self.fetchLocalizerStrings())
-
-        self.setupTextProperties()
-        self.splash.Close()
+        # Heavy startup work runs in the background once the window is up, see startBackgroundInit
+        self.resourcesReady: bool = False
+        self.localizerReady: bool = False
+        self.resourceProgress: Tuple[int, int] = (0, 0)
+        self.resourcesFuture: Future | None = None
+        self.localizerFuture: Future | None = None
 
     def quit(self, event = None):
         self.notify.info('Exiting SDK... Killing window...')
         self.Hide()
-        if not self.settings.get('keep_temp_files', False) or not self.settings.get('use_dev_resources', False):
+        if self.resourcesReady and self.resourceMode == ResourceMode.LAZY:
+            self.lazyExtractor.saveExtracted()
+        self.packsFolder.stopWatching()
+        if self.packModel is not None:
+            self.packModel.close()
+        if self.journal is not None:
+            # Writes the edits that aren't in the cog files yet
+            self.journal.close()
+        if self.packValidator is not None:
+            self.packValidator.shutdown()
+        # Extraction is incremental, so the extracted resources are kept between launches unless asked otherwise
+        if not self.settings.get('keep_temp_files', True):
+            # Deleted by a detached process, so closing the window doesn't wait on it
             self.notify.info('Exiting SDK... Cleaning up temp files...')
-            tempDataPath: str = 'sdk/temp/realms_resources'
-            if not os.path.exists(tempDataPath):
-                os.makedirs('sdk/temp/realms_resources')
-            else:
-                for file in os.scandir(tempDataPath):
-                    if os.path.isfile(file):
-                        os.unlink(file)
-                    elif os.path.isdir(file):
-                        shutil.rmtree(file)
+            discardDirectory('sdk/temp/realms_resources')
+        self.settings.flush()
         self.notify.info('Exiting SDK... Done.')
 
         super().quit(event)
 
     def runShell(self):
         self.notify.info('Setup complete, creating window...')
-        WxPandaShell.__init__(self)
+        self.startBackgroundInit()
+        self.splash.Close()
+        with self.profiler.phase('WxPandaShell.__init__'):
+            WxPandaShell.__init__(self)
+        taskMgr.add(self.__bootTask, 'dpdkBootTask')
+        # igLoop renders at sort 50, so this runs right after the first frame
+        taskMgr.add(self.__firstFrameTask, 'dpdkFirstFrameTask', sort = 55, extraArgs = [self.profiler.getElapsed()])
+
+    def startBackgroundInit(self):
+        """
+        Starts the game resource and localizer setup on worker threads,
+        so the window can be shown while they run
+        """
+        bootWorkers = ThreadPoolExecutor(max_workers = 2, thread_name_prefix = 'DPDKBoot')
+        self.resourcesFuture = bootWorkers.submit(self.setupGameResources)
+        self.localizerFuture = bootWorkers.submit(self.loadLocalizerStrings)
+        bootWorkers.shutdown(wait = False)
+
+    def __bootTask(self, task):
+        if not self.resourcesReady:
+            self.setStatus('Loading game resources...', *self.resourceProgress)
+            if self.resourcesFuture.done():
+                # Raises anything that went wrong on the worker
+                self.resourcesFuture.result()
+                self.resourcesReady = True
+                self.onResourcesReady()
+
+        if not self.localizerReady and self.localizerFuture.done():
+            self.localizerFuture.result()
+            self.localizerReady = True
+            self.refreshLocalizedText()
+
+        if self.resourcesReady and self.localizerReady:
+            self.setStatus('Ready')
+            self.saveStartupProfile()
+            return task.done
+        return task.cont
+
+    def __firstFrameTask(self, shellReady: float):
+        self.profiler.addEvent('first frame', self.profiler.origin + shellReady, time.perf_counter())
+        self.profiler.addEvent('time to interactive', self.profiler.origin, time.perf_counter())
+        self.firstFrameRendered = True
+        # Shown after the first frame so it isn't counted as part of creating the window
+        wx.CallAfter(self.showNotice)
+        self.saveStartupProfile()
+
+    def saveStartupProfile(self):
+        # Saved once the window is up and the background work is done, whichever comes last
+        if not (self.firstFrameRendered and self.resourcesReady and self.localizerReady):
+            return
+        self.profiler.save('sdk/temp/startup_trace.json', version = self.appversion, resource_mode = self.resourceMode)
+        if self.settings.get('log_startup_profile', False):
+            wx.LogMessage('Startup phases (start, duration, phase):')
+            for line in self.profiler.getSummary(category = None):
+                wx.LogMessage(line)
+
+    def onResourcesReady(self):
+        with self.profiler.phase('setupTextProperties'):
+            self.setupTextProperties()
+        # Loads the other body types in the background while the preview is created
+        taskMgr.add(CogBodyPool.prewarm(), 'cogBodyPrewarm')
+        with self.profiler.phase('createCogPreview'):
+            self.createCogPreview()
+        if self.activePack is not None:
+            # A pack was opened while we were still loading
+            self.loadPack(None)
+
+    def setupGameResources(self):
+        # Runs on a boot worker thread
+        useDevResources = self.settings.get('use_dev_resources', False)
+        if not useDevResources:
+            with self.profiler.phase('catalogGameClient'):
+                self.catalogGameClient()
+        if self.resourceMode == ResourceMode.MOUNT:
+            with self.profiler.phase('mountGameClient'):
+                self.mountGameClient()
+        elif self.resourceMode == ResourceMode.LAZY:
+            with self.profiler.phase('prepareLazyExtraction'):
+                self.prepareLazyExtraction()
+        elif not self.settings.get('dont_update_temp_files', False) or not useDevResources:
+            with self.profiler.phase('extractGameClient'):
+                self.extractGameClient()
+
+    def loadLocalizerStrings(self):
+        # Runs on a boot worker thread
+        if self.settings.get('use_dev_resources', False):
+            with self.profiler.phase('localizer import'):
+                self.fetchLocalizerStringsFromDev()
+        else:
+            asyncio.run(self.fetchLocalizerStrings())
 
     def extractGameClient(self):
-        tempDataPath: str = 'sdk/temp/realms_resources'
-        if not os.path.exists(tempDataPath):
-            os.makedirs('sdk/temp/realms_resources')
-        else:
-            for file in os.scandir(tempDataPath):
-                if os.path.isfile(file):
-                    os.unlink(file)
-                elif os.path.isdir(file):
-                    shutil.rmtree(file)
-
-        path = self.settings.get('realms_client_directory')
-        for multifile in (glob.glob(f'{path}resources\\default\\ttrm_mdl_*.pak')
-                          + glob.glob(f'{path}resources\\default\\ttrm_tex_*.pak')
-                          + glob.glob(f'{path}resources\\default\\ttrm_dat_*.pak')):
-            self.notify.info(f'Extracting {multifile}')
-            mf: Multifile = Multifile()
-            mf.openRead(Filename(PurePosixPath(multifile)))
-            for subfile in range(mf.getNumSubfiles()):
-                subfileName = mf.getSubfileName(subfile)
-                mf.extractSubfile(subfile, f'{tempDataPath}/{subfileName}')
+        extractor = ResourceExtractor(self.settings.get('realms_client_directory'), 'sdk/temp/realms_resources',
+                                      workers = self.settings.get('extraction_workers', None),
+                                      profiler = self.profiler)
+        extractor.extract(self.updateResourceProgress)
+
+    def updateResourceProgress(self, done: int, total: int):
+        # Called from the boot worker, the boot task shows it
+        self.resourceProgress = (done, total)
+
+    def catalogGameClient(self):
+        self.catalog = SubfileCatalog('sdk/temp/subfile_catalog.db')
+        self.catalog.update(findClientPaks(self.settings.get('realms_client_directory')))
+
+    def prepareLazyExtraction(self):
+        self.lazyExtractor = LazyResourceExtractor(self.settings.get('realms_client_directory'), self.gameResourcesPath, self.catalog)
+        self.lazyExtractor.prepare()
+
+    def mountGameClient(self):
+        self.resourceMounter = ResourceMounter(self.settings.get('realms_client_directory'), self.gameResourcesPath)
+        self.resourceMounter.mount()
 
     async def fetchLocalizerStrings(self):
         self.notify.info('Fetching Localizer Strings...')
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get('https://raw.githubusercontent.com/ttoff/modding-docs/master/localizer/otplocalizer.txt') as ttlResp:
-                    ttlLines = await ttlResp.text()
-                    with open('sdk/temp/otplocalizer.txt', 'w') as ttl:
-                        ttl.write(ttlLines)
-            except:
-                wx.MessageBox('There was an error fetching OTPLocalizer strings. '
-                              'This is likely an issue with your connection. '
-                              'Localizer strings may not display correctly, '
-                              'but this won\'t have any negative affect in-game.',
-                              'error!!!!!!!!!!!!!!!!!!!!!!!')
-
-            try:
-                async with session.get('https://raw.githubusercontent.com/ttoff/modding-docs/master/localizer/ttlocalizer.txt') as ttlResp:
-                    ttlLines = await ttlResp.text()
-                    with open('sdk/temp/ttlocalizer.txt', 'w') as ttl:
-                        ttl.write(ttlLines)
-            except:
-                wx.MessageBox('There was an error fetching TTLocalizer strings. '
+        fetcher = LocalizerFetcher('sdk/temp', self.settings.get('localizer_url', LOCALIZER_BASE_URL))
+        with self.profiler.phase('localizer fetch'):
+            results = await fetcher.fetchAll()
+        # Only complain when there isn't even a cached copy to fall back on
+        for filename, available in results.items():
+            if not available:
+                wx.CallAfter(wx.MessageBox, f'There was an error fetching {filename}. '
                               'This is likely an issue with your connection. '
                               'Localizer strings may not display correctly, '
                               'but this won\'t have any negative affect in-game.',
                               'error!!!!!!!!!!!!!!!!!!!!!!!')
 
-        with open('sdk/temp/otplocalizer.txt', 'r') as otpLocalizer:
-            for line in otpLocalizer.readlines():
-                _line = line.split(' = ')
-                if len(_line) == 2:
-                    key, value = _line[0], _line[1][1:-2]
-                    self.localizer[key] = value
-
-        with open('sdk/temp/ttlocalizer.txt', 'r') as ttLocalizer:
-            for line in ttLocalizer.readlines():
-                _line = line.split(' = ')
-                if len(_line) == 2:
-                    key, value = _line[0][1:], _line[1][1:-2]
-                    self.localizer[key] = value
+        with self.profiler.phase('localizer parse'):
+            sources = [fetcher.getPath(filename) for filename in LOCALIZER_FILES if results[filename]]
+            snapshot = LocalizerSnapshot('sdk/temp/localizer.snapshot', sources)
+            strings = snapshot.load()
+            if strings is None:
+                strings = {}
+                if results['otplocalizer.txt']:
+                    strings.update(parseLocalizerFile(fetcher.getPath('otplocalizer.txt')))
+                if results['ttlocalizer.txt']:
+                    strings.update(parseLocalizerFile(fetcher.getPath('ttlocalizer.txt'), keyStart = 1))
+                snapshot.save(strings)
+        self.localizer.update(strings)
 
     def fetchLocalizerStringsFromDev(self):
+        devDirectory = self.settings.get('dev_directory')
+        snapshot = LocalizerSnapshot('sdk/temp/localizer_dev.snapshot', [
+            os.path.join(devDirectory, 'toontown', 'toonbase', 'TTLocalizerEnglish.py'),
+            os.path.join(devDirectory, 'otp', 'otpbase', 'OTPLocalizerEnglish.py')
+        ])
+        strings = snapshot.load()
+        if strings is not None:
+            self.localizer.update(strings)
+            return
+
         self.notify.info('Importing localization strings from dev')
-        sys.path.append(self.settings.get('dev_directory'))
+        sys.path.append(devDirectory)
         from toontown.toonbase import TTLocalizerEnglish
-
-        for key, val in TTLocalizerEnglish.__dict__.items():
-            self.localizer['#' + key] = val
-
         from otp.otpbase import OTPLocalizerEnglish
-        for key, val in OTPLocalizerEnglish.__dict__.items():
-            self.localizer['#' + key] = val
+
+        strings = {}
+        for localizer in (TTLocalizerEnglish, OTPLocalizerEnglish):
+            for key, val in localizer.__dict__.items():
+                # Only strings can be shown (or compiled into the snapshot)
+                if isinstance(val, str):
+                    strings['#' + key] = val
+        snapshot.save(strings)
+        self.localizer.update(strings)
 
     @staticmethod
     def setupTextProperties():
@@ -180,6 +288,7 @@ class DPDKBase(WxPandaShell):
         whiteComedy = TextProperties()
         whiteComedy.setTextColor(1.0, 1.0, 1.0, 1.0)
         whiteComedy.setShadowColor(0.0, 0.0, 0.0, 1.0)
+        DataPackManager.ensureResource('phase_3/fonts/Comedy.ttf')
         whiteComedy.setFont(loader.loadFont('phase_3/fonts/Comedy.ttf'))
 
         tpm.setProperties('white_comedy', whiteComedy)
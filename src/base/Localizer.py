@@ -0,0 +1,185 @@
+"""
+Localizer strings
+Downloads the localizer text files concurrently, using conditional requests against a
+persisted ETag/Last-Modified cache so a warm start doesn't download anything.
+When the server can't be reached the cached copy is used.
+
+The parsed strings are kept in a compiled snapshot keyed by a hash of the sources,
+so they are only parsed (or imported, with dev resources) again when a source changes.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import marshal
+import os
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+LOCALIZER_BASE_URL = 'https://raw.githubusercontent.com/ttoff/modding-docs/master/localizer/'
+LOCALIZER_FILES = ('otplocalizer.txt', 'ttlocalizer.txt')
+
+
+class LocalizerFetcher:
+    notify = directNotify.newCategory('LocalizerFetcher')
+    notify.setInfo(True)
+
+    def __init__(self, cacheDirectory: str = 'sdk/temp', baseUrl: str = LOCALIZER_BASE_URL, timeout: float = 5.0):
+        """
+        :param cacheDirectory: Where the localizer files and their cache headers are kept
+        :param baseUrl: URL the localizer files are fetched from, can point at a local server for testing
+        :param timeout: Total timeout in seconds for each request
+        """
+        self.cacheDirectory: str = cacheDirectory
+        self.baseUrl: str = baseUrl if baseUrl.endswith('/') else f'{baseUrl}/'
+        self.timeout: float = timeout
+        self.cacheInfoPath: str = os.path.join(cacheDirectory, 'localizer_cache.json')
+        self.cacheInfo: Dict[str, Dict[str, str]] = self.loadCacheInfo()
+
+    def getPath(self, filename: str) -> str:
+        return os.path.join(self.cacheDirectory, filename)
+
+    async def fetchAll(self, filenames: Tuple[str, ...] = LOCALIZER_FILES) -> Dict[str, bool]:
+        """
+        :return: filename -> whether there is a usable copy on disk (downloaded or cached)
+        """
+        os.makedirs(self.cacheDirectory, exist_ok = True)
+        async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total = self.timeout)) as session:
+            results = await asyncio.gather(*(self.fetch(session, filename) for filename in filenames))
+        self.saveCacheInfo()
+        return dict(zip(filenames, results))
+
+    async def fetch(self, session: aiohttp.ClientSession, filename: str) -> bool:
+        path = self.getPath(filename)
+        hasCache = os.path.exists(path)
+        headers = {}
+        if hasCache:
+            info = self.cacheInfo.get(filename, {})
+            if 'etag' in info:
+                headers['If-None-Match'] = info['etag']
+            if 'last_modified' in info:
+                headers['If-Modified-Since'] = info['last_modified']
+
+        try:
+            async with session.get(f'{self.baseUrl}{filename}', headers = headers) as response:
+                if response.status == 304 and hasCache:
+                    self.notify.debug(f'{filename} is up to date')
+                    return True
+                response.raise_for_status()
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if hasCache:
+                self.notify.info(f'Unable to fetch {filename} ({e.__class__.__name__}), using the cached copy')
+            else:
+                self.notify.warning(f'Unable to fetch {filename} ({e.__class__.__name__})')
+            return hasCache
+
+        tempPath = f'{path}.tmp'
+        with open(tempPath, 'w', encoding = 'utf-8') as file:
+            file.write(text)
+        os.replace(tempPath, path)
+
+        info = {}
+        if 'ETag' in response.headers:
+            info['etag'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            info['last_modified'] = response.headers['Last-Modified']
+        self.cacheInfo[filename] = info
+        self.notify.info(f'Downloaded {filename}')
+        return True
+
+    def loadCacheInfo(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.exists(self.cacheInfoPath):
+            return {}
+        try:
+            with open(self.cacheInfoPath, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def saveCacheInfo(self):
+        tempPath = f'{self.cacheInfoPath}.tmp'
+        with open(tempPath, 'w') as file:
+            json.dump(self.cacheInfo, file, indent = 4)
+        os.replace(tempPath, self.cacheInfoPath)
+
+
+class LocalizerSnapshot:
+    """
+    Compiled localizer strings: MAGIC + VERSION + sha1 of the sources + marshalled dict
+    """
+    notify = directNotify.newCategory('LocalizerSnapshot')
+    notify.setInfo(True)
+
+    MAGIC = b'DPLS'
+    VERSION = 1
+
+    def __init__(self, path: str, sources: List[str]):
+        """
+        :param path: Where the snapshot is stored
+        :param sources: The files the strings are built from
+        """
+        self.path: str = path
+        self.sources: List[str] = sources
+        sourceHash = self.getSourceHash()
+        # Without the sources there's nothing to tell if a snapshot is up to date, so none is used
+        self.header: Optional[bytes] = self.MAGIC + bytes((self.VERSION,)) + sourceHash if sourceHash is not None else None
+
+    def getSourceHash(self) -> Optional[bytes]:
+        """
+        :return: Hash of the sources, or None if one of them can't be read (e.g. a checkout with only .pyc files)
+        """
+        sha = hashlib.sha1()
+        for source in self.sources:
+            sha.update(os.path.basename(source).encode('utf-8'))
+            try:
+                with open(source, 'rb') as file:
+                    sha.update(file.read())
+            except OSError:
+                self.notify.info(f'Unable to read {source}, not using a localizer snapshot')
+                return None
+        return sha.digest()
+
+    def load(self) -> Optional[Dict[str, str]]:
+        """
+        :return: The snapshot's strings, or None if it is missing or out of date
+        """
+        if self.header is None or not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        if not data.startswith(self.header):
+            return None
+        try:
+            return marshal.loads(data[len(self.header):])
+        except (EOFError, ValueError, TypeError):
+            self.notify.warning('Localizer snapshot is corrupt, rebuilding it.')
+            return None
+
+    def save(self, strings: Dict[str, str]):
+        if self.header is None:
+            return
+        tempPath = f'{self.path}.tmp'
+        with open(tempPath, 'wb') as file:
+            file.write(self.header)
+            file.write(marshal.dumps(strings))
+        os.replace(tempPath, self.path)
+        self.notify.info(f'Compiled {len(strings)} localizer strings')
+
+
+def parseLocalizerFile(path: str, keyStart: int = 0) -> Dict[str, str]:
+    """
+    Parses the `key = 'value'` lines of a localizer text file
+
+    :param keyStart: Number of characters to skip at the start of each key
+    """
+    strings = {}
+    with open(path, 'r', encoding = 'utf-8') as file:
+        for line in file.readlines():
+            _line = line.split(' = ')
+            if len(_line) == 2:
+                strings[_line[0][keyStart:]] = _line[1][1:-2]
+    return strings
@@ -0,0 +1,460 @@
+"""
+Game Client Resource Extractor
+Keeps the extracted copy of the game's .pak Multifiles in sync using a manifest.
+
+The manifest records each pak's size, mtime and hash along with the timestamp and length of
+every subfile, so a launch only extracts new or changed subfiles and prunes deleted ones.
+It also records which pak every extracted subfile came from, so a subfile is extracted again
+from its new owner when the pak that overrode it drops it or starts overriding it.
+A launch where nothing changed only has to stat the paks.
+
+Changed paks are scanned and extracted on a process pool, split by pak and by subfile range.
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import Multifile, Filename
+
+from src.base.StartupProfiler import StartupProfiler
+from src.base.SubfileCatalog import SubfileCatalog
+from src.ott.WriteBehind import WriteBehind
+
+# Subfile record: [timestamp, length]
+TSubfileRecord = List[int]
+
+PAK_PATTERNS = ('ttrm_mdl_*.pak', 'ttrm_tex_*.pak', 'ttrm_dat_*.pak')
+
+
+def findClientPaks(clientPath: str) -> List[str]:
+    """
+    :param clientPath: Toontown Realms installation directory
+    :return: The client's resource paks, in the order they override each other
+    """
+    paks = []
+    for pattern in PAK_PATTERNS:
+        paks += glob.glob(f'{clientPath}resources\\default\\{pattern}')
+    return paks
+
+
+class ResourceExtractor:
+    notify = directNotify.newCategory('ResourceExtractor')
+    notify.setInfo(True)
+
+    MANIFEST_VERSION = 2
+    MANIFEST_NAME = '.extraction_manifest.json'
+
+    # Upper bounds for a single worker job
+    CHUNK_MAX_SUBFILES = 512
+    CHUNK_MAX_BYTES = 32 << 20
+
+    def __init__(self, clientPath: str, outputPath: str, workers: Optional[int] = None,
+                 profiler: Optional[StartupProfiler] = None):
+        """
+        :param clientPath: Toontown Realms installation directory
+        :param outputPath: Directory the subfiles get extracted to
+        :param workers: Number of extraction processes, defaults to the number of CPUs
+        :param profiler: Records how long each pak took to scan and extract
+        """
+        self.clientPath: str = clientPath
+        self.outputPath: str = outputPath
+        self.workers: int = workers or os.cpu_count() or 1
+        self.manifestPath: str = os.path.join(outputPath, self.MANIFEST_NAME)
+        self.profiler: Optional[StartupProfiler] = profiler
+
+    def getPakFiles(self) -> List[str]:
+        return findClientPaks(self.clientPath)
+
+    def extract(self, progressCallback: Optional[Callable[[int, int], None]] = None):
+        """
+        Brings the output directory up to date with the client's paks.
+        Changed paks are scanned and extracted in parallel on a process pool.
+
+        :param progressCallback: Called regularly with (extracted subfiles, subfiles to extract)
+                                 while waiting on the workers. total is 0 while the paks are still being scanned.
+        """
+        startTime = time.perf_counter()
+        oldManifest = self.loadManifest()
+        if oldManifest is None:
+            # No (usable) manifest, we can't trust anything that is already extracted
+            self.clearOutput()
+            oldPaks, oldOwners = {}, {}
+        else:
+            oldPaks, oldOwners = oldManifest['paks'], oldManifest.get('owners', {})
+
+        newPaks: Dict[str, Dict] = {}
+        changed: Dict[str, Tuple[str, os.stat_result]] = {}
+        for multifile in self.getPakFiles():
+            pakName = os.path.basename(multifile)
+            oldEntry = oldPaks.get(pakName)
+            stat = os.stat(multifile)
+            if oldEntry is not None and oldEntry['size'] == stat.st_size and oldEntry['mtime'] == stat.st_mtime_ns:
+                newPaks[pakName] = oldEntry
+            else:
+                # Placeholder to keep the pak order, filled in once it's scanned
+                newPaks[pakName] = None
+                changed[pakName] = (multifile, stat)
+
+        extractedFiles = extractedBytes = 0
+        with ProcessPoolExecutor(max_workers = self.workers) as pool:
+            scans = {}
+            if changed:
+                # Size or mtime changed, scan the paks to see what actually did
+                scans = {pool.submit(scanPak, multifile): pakName for pakName, (multifile, _) in changed.items()}
+                self.profileFutures(scans, 'scan')
+                self.waitFor(scans, lambda: progressCallback and progressCallback(0, 0))
+            jobs, owners = self.planExtraction(oldPaks, newPaks, changed, {scans[f]: f.result() for f in scans}, oldOwners)
+
+            total = sum(len(job[2]) for job in jobs)
+            futures = {pool.submit(extractSubfiles, *job): len(job[2]) for job in jobs}
+            self.profileFutures({future: os.path.basename(job[0]) for future, job in zip(futures, jobs)}, 'extract')
+
+            def onProgress():
+                if progressCallback:
+                    progressCallback(sum(futures[f] for f in futures if f.done()), total)
+
+            self.waitFor(futures, onProgress)
+            for future in futures:
+                extractedFiles += futures[future]
+                extractedBytes += future.result()
+
+        self.prune(oldPaks, newPaks)
+        self.saveManifest(newPaks, owners)
+
+        elapsed = time.perf_counter() - startTime
+        if extractedFiles:
+            self.notify.info(f'Extracted {extractedFiles} subfiles ({extractedBytes / 1048576:.1f} MB) '
+                             f'in {elapsed:.2f}s ({extractedBytes / 1048576 / max(elapsed, 1e-6):.1f} MB/s) '
+                             f'using {self.workers} workers')
+        else:
+            self.notify.info(f'Game resources are up to date ({elapsed:.2f}s)')
+
+    def planExtraction(self, oldPaks: Dict[str, Dict], newPaks: Dict[str, Optional[Dict]],
+                       changed: Dict[str, Tuple[str, os.stat_result]],
+                       scans: Dict[str, Tuple[str, List[Tuple[int, str, TSubfileRecord]]]],
+                       oldOwners: Dict[str, str]) -> Tuple[List[Tuple[str, str, List[str]]], Dict[str, str]]:
+        """
+        Fills in the manifest entries of the scanned paks and splits the subfiles
+        that need extracting into (multifile, outputPath, subfile names) jobs
+
+        :param oldOwners: Subfile name -> the pak its extracted copy came from
+        :return: The jobs, and the pak each subfile is extracted from after they're done
+        """
+        for pakName, (multifile, stat) in changed.items():
+            pakHash, subfileList = scans[pakName]
+            oldEntry = oldPaks.get(pakName)
+            if oldEntry is not None and oldEntry['hash'] == pakHash:
+                oldEntry['size'] = stat.st_size
+                oldEntry['mtime'] = stat.st_mtime_ns
+                newPaks[pakName] = oldEntry
+                continue
+            newPaks[pakName] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': pakHash,
+                'subfiles': {name: record for _, name, record in subfileList}
+            }
+
+        # Paks later in the list override the subfiles of earlier ones, only extract the winning copy
+        owners: Dict[str, str] = {}
+        for pakName, entry in newPaks.items():
+            for subfileName in entry['subfiles']:
+                owners[subfileName] = pakName
+
+        multifiles = {os.path.basename(multifile): multifile for multifile in self.getPakFiles()}
+        toExtract: Dict[str, List[Tuple[str, int]]] = {pakName: [] for pakName in newPaks}
+        for subfileName, pakName in owners.items():
+            record = newPaks[pakName]['subfiles'][subfileName]
+            oldEntry = oldPaks.get(pakName)
+            oldRecord = oldEntry['subfiles'].get(subfileName) if oldEntry is not None else None
+            # The owner changed (an override was added or dropped), or the owner's copy did
+            if oldOwners.get(subfileName) != pakName or oldRecord != record:
+                toExtract[pakName].append((subfileName, record[1]))
+
+        jobs = []
+        for pakName, subfiles in toExtract.items():
+            if pakName in changed or subfiles:
+                self.notify.info(f'{len(subfiles)} of {len(newPaks[pakName]["subfiles"])} subfiles changed in {pakName}')
+
+            # Split the pak into subfile ranges so big paks are shared between workers
+            chunk, chunkBytes = [], 0
+            for subfileName, length in subfiles:
+                chunk.append(subfileName)
+                chunkBytes += length
+                if len(chunk) >= self.CHUNK_MAX_SUBFILES or chunkBytes >= self.CHUNK_MAX_BYTES:
+                    jobs.append((multifiles[pakName], self.outputPath, chunk))
+                    chunk, chunkBytes = [], 0
+            if chunk:
+                jobs.append((multifiles[pakName], self.outputPath, chunk))
+        return jobs, owners
+
+    def profileFutures(self, futures: Dict[Future, str], action: str):
+        """
+        Records one event per pak, spanning from when its first job was submitted to when its last one finished
+        """
+        if self.profiler is None:
+            return
+        start = time.perf_counter()
+        remaining: Dict[str, int] = {}
+        for pakName in futures.values():
+            remaining[pakName] = remaining.get(pakName, 0) + 1
+
+        lock = threading.Lock()
+
+        def onDone(future: Future):
+            # Runs on the pool's management thread
+            pakName = futures[future]
+            with lock:
+                remaining[pakName] -= 1
+                finished = not remaining[pakName]
+            if finished:
+                self.profiler.addEvent(f'{action} {pakName}', start, time.perf_counter(), 'extraction',
+                                       thread = f'{action} workers')
+
+        for future in futures:
+            future.add_done_callback(onDone)
+
+    @staticmethod
+    def waitFor(futures: Iterable[Future], onTick: Callable[[], None]):
+        pending = set(futures)
+        while pending:
+            onTick()
+            _, pending = wait(pending, timeout = 0.05, return_when = FIRST_COMPLETED)
+        onTick()
+
+    def prune(self, oldPaks: Dict[str, Dict], newPaks: Dict[str, Dict]):
+        """
+        Deletes extracted subfiles that no longer exist in any pak
+        """
+        newNames = set()
+        for entry in newPaks.values():
+            newNames.update(entry['subfiles'])
+
+        pruned = 0
+        for entry in oldPaks.values():
+            for subfileName in entry['subfiles']:
+                if subfileName in newNames:
+                    continue
+                newNames.add(subfileName)  # don't try to remove it twice
+                path = os.path.join(self.outputPath, subfileName)
+                if os.path.isfile(path):
+                    os.unlink(path)
+                    pruned += 1
+                    try:
+                        os.removedirs(os.path.dirname(path))
+                    except OSError:
+                        # Directory isn't empty
+                        pass
+
+        if pruned:
+            self.notify.info(f'Pruned {pruned} deleted subfiles')
+
+    def clearOutput(self):
+        if not os.path.exists(self.outputPath):
+            os.makedirs(self.outputPath)
+            return
+        for file in os.scandir(self.outputPath):
+            if os.path.isfile(file):
+                os.unlink(file)
+            elif os.path.isdir(file):
+                shutil.rmtree(file)
+
+    def loadManifest(self) -> Optional[Dict]:
+        if not os.path.exists(self.manifestPath):
+            return None
+        try:
+            with open(self.manifestPath, 'r') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            self.notify.warning('Extraction manifest is corrupt, extracting everything again.')
+            return None
+        if manifest.get('version') != self.MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def getManifestText(self, paks: Dict[str, Dict], owners: Optional[Dict[str, str]] = None) -> str:
+        return json.dumps({'version': self.MANIFEST_VERSION, 'paks': paks, 'owners': owners or {}}, separators = (',', ':'))
+
+    def saveManifest(self, paks: Dict[str, Dict], owners: Optional[Dict[str, str]] = None):
+        tempPath = f'{self.manifestPath}.tmp'
+        with open(tempPath, 'w') as file:
+            file.write(self.getManifestText(paks, owners))
+        os.replace(tempPath, self.manifestPath)
+
+
+class LazyResourceExtractor(ResourceExtractor):
+    """
+    Only extracts a subfile the first time something asks for it, using the subfile catalog to find it.
+    Extracted subfiles are kept in their own manifest, so they stay cached between launches.
+    """
+    MANIFEST_NAME = '.lazy_manifest.json'
+    # Seconds extractions are coalesced for before the manifest is saved
+    MANIFEST_SAVE_DELAY = 2.0
+    # .bam files reference their textures by path, those have to be extracted alongside the model
+    TEXTURE_REFERENCE = re.compile(rb'[\w.\-/]+\.(?:png|jpg|jpeg|rgb|rgba|tga|bmp|sgi|tif|tiff|txo|dds)')
+
+    def __init__(self, clientPath: str, outputPath: str, catalog: SubfileCatalog):
+        """
+        :param catalog: An up to date catalog of the client's paks
+        """
+        super().__init__(clientPath, outputPath, workers = 1)
+        self.catalog: SubfileCatalog = catalog
+        # Opened on first use
+        self.multifiles: Dict[str, Multifile] = {}
+        # Same layout as the extraction manifest, but subfiles only holds what has been extracted
+        self.paks: Dict[str, Dict] = {}
+        # Saved shortly after each extraction, so a crash doesn't throw the extracted subfiles away
+        self.autosave = WriteBehind(serialize = self.getManifestText, delay = self.MANIFEST_SAVE_DELAY)
+
+    def prepare(self):
+        """
+        Drops the extracted subfiles that changed since the last launch
+        """
+        oldManifest = self.loadManifest()
+        if oldManifest is None:
+            self.clearOutput()
+            oldPaks = {}
+        else:
+            oldPaks = oldManifest['paks']
+
+        for multifile in self.getPakFiles():
+            pakName = os.path.basename(multifile)
+            stat = os.stat(multifile)
+            oldEntry = oldPaks.get(pakName)
+            extracted: Dict[str, TSubfileRecord] = {}
+            if oldEntry is not None and oldEntry['size'] == stat.st_size and oldEntry['mtime'] == stat.st_mtime_ns:
+                extracted = oldEntry['subfiles']
+            elif oldEntry is not None:
+                # The pak changed, only keep what is still identical
+                for subfileName, record in oldEntry['subfiles'].items():
+                    entry = self.catalog.lookup(subfileName)
+                    if entry is not None and entry.pak == pakName and [entry.timestamp, entry.size] == record:
+                        extracted[subfileName] = record
+            self.paks[pakName] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': None,
+                'subfiles': extracted
+            }
+
+        self.prune(oldPaks, self.paks)
+        if self.paks != oldPaks:
+            # Runs on a boot worker, so this can be written straight away
+            self.saveManifest(self.paks)
+        self.notify.info(f'Lazy extraction ready, {sum(len(pak["subfiles"]) for pak in self.paks.values())} subfiles cached')
+
+    def getSubfileName(self, path: str) -> Optional[str]:
+        """
+        :param path: A path relative to the resources root, or an absolute path inside of it
+        :return: The matching subfile name, or None if no pak has it
+        """
+        path = path.replace('\\', '/')
+        if os.path.isabs(path):
+            path = os.path.relpath(path, os.path.abspath(self.outputPath)).replace('\\', '/')
+            if path.startswith('..'):
+                return None
+        while path.startswith('./'):
+            path = path[2:]
+        if self.catalog.lookup(path) is not None:
+            return path
+        # Model paths can leave out the default-model-extension
+        if '.' not in os.path.basename(path) and self.catalog.lookup(f'{path}.bam') is not None:
+            return f'{path}.bam'
+        return None
+
+    def getMultifile(self, pakName: str) -> Multifile:
+        if pakName not in self.multifiles:
+            mf: Multifile = Multifile()
+            mf.openRead(Filename(PurePosixPath(self.catalog.getPakPath(pakName))))
+            self.multifiles[pakName] = mf
+        return self.multifiles[pakName]
+
+    def ensure(self, path: str) -> bool:
+        """
+        Extracts a subfile (and the textures it references) if it hasn't been already
+
+        :param path: A path relative to the resources root, or an absolute path inside of it
+        :return: Whether the path is a game resource
+        """
+        subfileName = self.getSubfileName(path)
+        if subfileName is None:
+            return False
+        entry = self.catalog.lookup(subfileName)
+        extracted = self.paks[entry.pak]['subfiles']
+        if subfileName in extracted:
+            return True
+
+        data = self.getMultifile(entry.pak).readSubfile(entry.index)
+        outputFile = os.path.join(self.outputPath, subfileName)
+        os.makedirs(os.path.dirname(outputFile), exist_ok = True)
+        with open(outputFile, 'wb') as file:
+            file.write(data)
+        extracted[subfileName] = [entry.timestamp, entry.size]
+        self.markManifestDirty()
+        self.notify.debug(f'Extracted {subfileName}')
+
+        if subfileName.endswith('.bam'):
+            for reference in set(self.TEXTURE_REFERENCE.findall(data)):
+                self.ensure(reference.decode('utf-8', 'ignore'))
+        return True
+
+    def markManifestDirty(self):
+        # Copied when the save window is over, the writer gets a copy that doesn't change under it
+        self.autosave.markDirty(self.manifestPath, lambda: {pakName: dict(entry, subfiles = dict(entry['subfiles']))
+                                                             for pakName, entry in self.paks.items()})
+
+    def saveExtracted(self):
+        """
+        Writes the manifest if anything was extracted since it was last saved, and waits for it
+        """
+        self.autosave.flush()
+
+
+def hashFile(path: str) -> str:
+    sha = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# Worker functions, these run in the extraction process pool so they have to stay picklable
+
+
+def scanPak(multifile: str) -> Tuple[str, List[Tuple[int, str, TSubfileRecord]]]:
+    """
+    :return: The pak's hash and a list of (index, name, [timestamp, length]) for each subfile
+    """
+    pakHash = hashFile(multifile)
+    mf: Multifile = Multifile()
+    mf.openRead(Filename(PurePosixPath(multifile)))
+    subfiles = [(subfile, mf.getSubfileName(subfile), [mf.getSubfileTimestamp(subfile), mf.getSubfileLength(subfile)])
+                for subfile in range(mf.getNumSubfiles())]
+    mf.close()
+    return pakHash, subfiles
+
+
+def extractSubfiles(multifile: str, outputPath: str, subfileNames: List[str]) -> int:
+    """
+    :return: Number of bytes extracted
+    """
+    extractedBytes = 0
+    mf: Multifile = Multifile()
+    mf.openRead(Filename(PurePosixPath(multifile)))
+    for subfileName in subfileNames:
+        subfile = mf.findSubfile(subfileName)
+        mf.extractSubfile(subfile, f'{outputPath}/{subfileName}')
+        extractedBytes += mf.getSubfileLength(subfile)
+    mf.close()
+    return extractedBytes
@@ -0,0 +1,48 @@
+"""
+Game Client Resource Mounter
+Mounts the game's .pak Multifiles straight into the VirtualFileSystem instead of extracting them.
+
+The paks are mounted read-only over the game resources directory, so everything that goes
+through the model-path (or the VFS) sees the same files it would after an extraction.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import PurePosixPath
+from typing import List
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import Filename, VirtualFileSystem
+
+from src.base.ResourceExtractor import findClientPaks
+
+
+class ResourceMounter:
+    notify = directNotify.newCategory('ResourceMounter')
+    notify.setInfo(True)
+
+    def __init__(self, clientPath: str, mountPoint: str):
+        """
+        :param clientPath: Toontown Realms installation directory
+        :param mountPoint: Directory the paks get mounted over
+        """
+        self.clientPath: str = clientPath
+        self.mountPoint: Filename = Filename.fromOsSpecific(os.path.abspath(mountPoint))
+        self.mounted: List[Filename] = []
+
+    def mount(self):
+        vfs = VirtualFileSystem.getGlobalPtr()
+        # Later mounts take precedence, which matches the order the paks override each other in
+        for multifile in findClientPaks(self.clientPath):
+            pakFilename = Filename(PurePosixPath(multifile))
+            if vfs.mount(pakFilename, self.mountPoint, VirtualFileSystem.MFReadOnly):
+                self.notify.info(f'Mounted {multifile}')
+                self.mounted.append(pakFilename)
+            else:
+                self.notify.warning(f'Unable to mount {multifile}')
+
+    def unmount(self):
+        vfs = VirtualFileSystem.getGlobalPtr()
+        for pakFilename in self.mounted:
+            vfs.unmount(pakFilename)
+        self.mounted = []
@@ -0,0 +1,102 @@
+"""
+Startup Profiler
+Times the phases of the SDK's boot and writes them out as a Chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev) so slow starts and
+regressions between versions can be tracked down.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+
+class StartupProfiler:
+    notify = directNotify.newCategory('StartupProfiler')
+    notify.setInfo(True)
+
+    def __init__(self):
+        # Everything is measured from when the profiler was created
+        self.origin: float = time.perf_counter()
+        self.events: List[Dict] = []
+        self.threadNames: Dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, category: str = 'startup', **args) -> Iterator[None]:
+        """
+        Times the code inside of the with block
+
+        :param name: Phase name shown in the trace
+        :param category: Trace category, used to group phases
+        :param args: Extra information attached to the event
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addEvent(name, start, time.perf_counter(), category, **args)
+
+    def addEvent(self, name: str, start: float, end: float, category: str = 'startup',
+                 thread: Optional[str] = None, **args):
+        """
+        Records a phase that was timed elsewhere
+
+        :param start: time.perf_counter() at the start of the phase
+        :param end: time.perf_counter() at the end of the phase
+        :param thread: Name of the track the event is shown on, defaults to the calling thread
+        """
+        if thread is None:
+            tid = threading.get_ident()
+            thread = threading.current_thread().name
+        else:
+            tid = hash(thread) & 0x7FFFFFFF
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.origin) * 1e6),
+            'dur': round((end - start) * 1e6),
+            'pid': os.getpid(),
+            'tid': tid
+        }
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.threadNames.setdefault(tid, thread)
+            self.events.append(event)
+
+    def getElapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def getSummary(self, category: Optional[str] = 'startup') -> List[str]:
+        """
+        :param category: Only include the phases of this category, None for everything
+        :return: One line per phase, in the order they started
+        """
+        with self.lock:
+            events = sorted((event for event in self.events if category is None or event['cat'] == category),
+                            key = lambda event: event['ts'])
+        return [f"{event['ts'] / 1e3:9.1f} ms  {event['dur'] / 1e3:9.1f} ms  {event['name']}" for event in events]
+
+    def save(self, path: str, **metadata):
+        """
+        Writes a Chrome trace of every recorded phase
+
+        :param metadata: Extra information stored in the trace, like the SDK version
+        """
+        with self.lock:
+            events = list(self.events)
+            events += [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                       for tid, name in self.threadNames.items()]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+        tempPath = f'{path}.tmp'
+        with open(tempPath, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': metadata}, file, indent = 1)
+        os.replace(tempPath, path)
+        self.notify.info(f'Startup took {self.getElapsed():.2f}s, wrote the startup trace to {path}')
@@ -0,0 +1,175 @@
+"""
+Subfile Catalog
+Persistent index of every subfile in the client's resource paks (name -> pak, index, offset, size, type)
+
+Each pak's subfile list is only rescanned when its size or mtime changes. The resolved view
+(where later paks override earlier ones) is what queries run against, so listing a directory
+or searching for a file never has to walk the extracted tree or open a pak.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import PurePosixPath
+from typing import List, NamedTuple, Optional, Tuple
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import Multifile, Filename
+
+
+class CatalogEntry(NamedTuple):
+    name: str
+    pak: str
+    index: int
+    offset: int
+    size: int
+    timestamp: int
+    extension: str
+
+
+class SubfileCatalog:
+    notify = directNotify.newCategory('SubfileCatalog')
+    notify.setInfo(True)
+
+    SCHEMA_VERSION = 1
+    SUBFILE_COLUMNS = 'name, pak, idx, offset, size, timestamp, ext, phase, directory'
+
+    def __init__(self, filename: str):
+        """
+        :param filename: Path to the catalog database
+        """
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok = True)
+        self.connection = sqlite3.connect(filename, check_same_thread = False)
+        self.createTables()
+
+    def createTables(self):
+        cursor = self.connection.cursor()
+        if cursor.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+            cursor.executescript('DROP TABLE IF EXISTS paks; DROP TABLE IF EXISTS pak_subfiles; DROP TABLE IF EXISTS subfiles;')
+        cursor.executescript(f'''
+            CREATE TABLE IF NOT EXISTS paks (name TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime INTEGER, position INTEGER);
+            CREATE TABLE IF NOT EXISTS pak_subfiles (name TEXT, pak TEXT, idx INTEGER, offset INTEGER, size INTEGER,
+                                                     timestamp INTEGER, ext TEXT, phase TEXT, directory TEXT);
+            CREATE INDEX IF NOT EXISTS pak_subfiles_pak ON pak_subfiles (pak);
+            CREATE TABLE IF NOT EXISTS subfiles (name TEXT PRIMARY KEY, pak TEXT, idx INTEGER, offset INTEGER, size INTEGER,
+                                                 timestamp INTEGER, ext TEXT, phase TEXT, directory TEXT) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS subfiles_ext ON subfiles (ext);
+            CREATE INDEX IF NOT EXISTS subfiles_phase ON subfiles (phase);
+            CREATE INDEX IF NOT EXISTS subfiles_directory ON subfiles (directory);
+            PRAGMA user_version = {self.SCHEMA_VERSION};
+        ''')
+        self.connection.commit()
+
+    def update(self, paks: List[str]):
+        """
+        Rescans the paks whose fingerprint changed and rebuilds the resolved view if anything did
+
+        :param paks: The client's paks, in the order they override each other
+        """
+        cursor = self.connection.cursor()
+        known = {name: (size, mtime, position) for name, size, mtime, position
+                 in cursor.execute('SELECT name, size, mtime, position FROM paks')}
+        changed = False
+
+        for position, multifile in enumerate(paks):
+            pakName = os.path.basename(multifile)
+            stat = os.stat(multifile)
+            if known.pop(pakName, None) == (stat.st_size, stat.st_mtime_ns, position):
+                continue
+            changed = True
+            cursor.execute('DELETE FROM pak_subfiles WHERE pak = ?', (pakName,))
+            cursor.executemany(f'INSERT INTO pak_subfiles ({self.SUBFILE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               self.scanPak(multifile, pakName))
+            cursor.execute('INSERT OR REPLACE INTO paks (name, path, size, mtime, position) VALUES (?, ?, ?, ?, ?)',
+                           (pakName, multifile, stat.st_size, stat.st_mtime_ns, position))
+            self.notify.info(f'Cataloged {multifile}')
+
+        # Whatever is left over was removed from the client
+        for pakName in known:
+            changed = True
+            cursor.execute('DELETE FROM pak_subfiles WHERE pak = ?', (pakName,))
+            cursor.execute('DELETE FROM paks WHERE name = ?', (pakName,))
+
+        if changed:
+            cursor.execute('DELETE FROM subfiles')
+            for pakName, in cursor.execute('SELECT name FROM paks ORDER BY position').fetchall():
+                # Later paks replace the entries of earlier ones
+                cursor.execute(f'INSERT OR REPLACE INTO subfiles ({self.SUBFILE_COLUMNS}) '
+                               f'SELECT {self.SUBFILE_COLUMNS} FROM pak_subfiles WHERE pak = ?', (pakName,))
+            self.notify.info(f'Catalog rebuilt with {self.getNumSubfiles()} subfiles')
+        self.connection.commit()
+
+    @staticmethod
+    def scanPak(multifile: str, pakName: str) -> List[Tuple]:
+        mf: Multifile = Multifile()
+        mf.openRead(Filename(PurePosixPath(multifile)))
+        rows = []
+        for subfile in range(mf.getNumSubfiles()):
+            subfileName = mf.getSubfileName(subfile)
+            directory, _, basename = subfileName.rpartition('/')
+            phase = subfileName.split('/', 1)[0] if subfileName.startswith('phase_') else ''
+            rows.append((subfileName, pakName, subfile, mf.getSubfileInternalStart(subfile), mf.getSubfileLength(subfile),
+                         mf.getSubfileTimestamp(subfile), os.path.splitext(basename)[1][1:].lower(), phase, directory))
+        mf.close()
+        return rows
+
+    def query(self, prefix: str = '', pattern: Optional[str] = None, contains: Optional[str] = None,
+              extensions: Tuple[str, ...] = (), phases: Tuple[str, ...] = (), directory: Optional[str] = None,
+              limit: Optional[int] = None) -> List[str]:
+        """
+        Searches the catalog, all the given filters have to match
+
+        :param prefix: Names starting with this, e.g. 'phase_3/maps/'
+        :param pattern: Names matching this glob pattern, e.g. 'phase_3/data/cogs/appearance/*.json'
+        :param contains: Names containing this (case insensitive)
+        :param extensions: Names with one of these extensions (without the dot)
+        :param phases: Names in one of these phase directories, e.g. 'phase_3.5'
+        :param directory: Names directly inside of this directory
+        :param limit: Maximum number of results
+        :return: Sorted subfile names
+        """
+        clauses, args = [], []
+        if prefix:
+            clauses.append('name >= ? AND name < ?')
+            args += [prefix, prefix + '\U0010ffff']
+        if pattern:
+            clauses.append('name GLOB ?')
+            args.append(pattern)
+        if contains:
+            clauses.append('instr(lower(name), ?) > 0')
+            args.append(contains.lower())
+        if extensions:
+            clauses.append(f"ext IN ({', '.join('?' * len(extensions))})")
+            args += [extension.lower() for extension in extensions]
+        if phases:
+            clauses.append(f"phase IN ({', '.join('?' * len(phases))})")
+            args += phases
+        if directory is not None:
+            clauses.append('directory = ?')
+            args.append(directory.rstrip('/'))
+
+        sql = 'SELECT name FROM subfiles'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY name'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return [name for name, in self.connection.execute(sql, args)]
+
+    def lookup(self, name: str) -> Optional[CatalogEntry]:
+        row = self.connection.execute('SELECT name, pak, idx, offset, size, timestamp, ext FROM subfiles WHERE name = ?',
+                                      (name,)).fetchone()
+        return CatalogEntry(*row) if row is not None else None
+
+    def getPakPath(self, pakName: str) -> Optional[str]:
+        row = self.connection.execute('SELECT path FROM paks WHERE name = ?', (pakName,)).fetchone()
+        return row[0] if row is not None else None
+
+    def getPhases(self) -> List[str]:
+        return [phase for phase, in self.connection.execute("SELECT DISTINCT phase FROM subfiles WHERE phase != '' ORDER BY phase")]
+
+    def getNumSubfiles(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM subfiles').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,70 @@
+"""
+Temp Cleanup
+Deletes temp directories without making anyone wait on it.
+
+The directory is renamed to a tombstone (which is instant) and the tombstone is deleted by a
+detached process, so it keeps going after the SDK exits. Tombstones the deleter didn't get to,
+e.g. because the machine shut down, are swept up on the next launch.
+"""
+from __future__ import annotations
+
+import glob
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+notify = directNotify.newCategory('TempCleanup')
+notify.setInfo(True)
+
+TOMBSTONE_SUFFIX = '.tombstone'
+
+# Run by the detached deleter, removes every path it's given
+DELETER_SCRIPT = 'import shutil, sys\nfor path in sys.argv[1:]:\n    shutil.rmtree(path, ignore_errors = True)'
+
+
+def discardDirectory(path: str):
+    """
+    Moves the directory out of the way and deletes it in the background
+
+    :param path: Directory to delete, nothing happens if it doesn't exist
+    """
+    if not os.path.isdir(path):
+        return
+    path = os.path.normpath(path)
+    tombstone = f'{path}.{os.getpid()}.{time.time_ns()}{TOMBSTONE_SUFFIX}'
+    try:
+        os.rename(path, tombstone)
+    except OSError as e:
+        # Something still has a file open in there, delete it in place instead
+        notify.warning(f'Unable to move {path} out of the way ({e.__class__.__name__}), deleting it in place')
+        tombstone = path
+    spawnDeleter([tombstone])
+
+
+def sweepTombstones(directory: str):
+    """
+    Deletes the tombstones a previous run left behind
+
+    :param directory: Directory the tombstones were left in
+    """
+    tombstones = glob.glob(os.path.join(glob.escape(directory), f'*{TOMBSTONE_SUFFIX}'))
+    if tombstones:
+        notify.info(f'Deleting {len(tombstones)} leftover temp directories')
+        spawnDeleter(tombstones)
+
+
+def spawnDeleter(paths: List[str]):
+    """
+    Starts a process that deletes the paths, which isn't tied to this one and won't be waited on
+    """
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess.Popen([sys.executable, '-c', DELETER_SCRIPT, *paths], stdin = subprocess.DEVNULL,
+                     stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, close_fds = True, **kwargs)
@@ -20,3 +20,17 @@ DefaultCogAppearance = (
     (1.0, 1.0, 1.0, 1.0),
     (1.0, 1.0, 1.0, 1.0)
 )
+
+NOT_FOUND_TEXTURE = 'phase_3/maps/ttrm_t_gen_textureNotFound.png'
+
+
+class ResourceMode:
+    """
+    How the game's resource paks are made available to the SDK (the resource_mode setting)
+    """
+    # Extract every pak into the game resources directory
+    EXTRACT = 'extract'
+    # Mount the paks into the VirtualFileSystem over the game resources directory
+    MOUNT = 'mount'
+    # Index the paks and only extract a subfile the first time it is needed
+    LAZY = 'lazy'
@@ -1,18 +1,34 @@
 # = Distributed DataPackManager - Client Side =
 # Created by drewc on 4/26/2023 11:08 PM
 # 5/9/23 - altered version for SDK removing in-game only features
-from typing import List, Dict, Optional
+import os
+from typing import List, Dict, Optional, Tuple
 
 from direct.directnotify import DirectNotifyGlobal
-from panda3d.core import NodePath, Texture
+from panda3d.core import NodePath, Texture, Filename, VirtualFileSystem
 
 from src.base import DPDKGlobal
+from src.datapack.DataPackGlobals import ResourceMode, NOT_FOUND_TEXTURE
+from src.datapack.HeadCache import HeadCache
+from src.datapack.ModelCache import ModelCache
+from src.datapack.TextureCache import TextureCache
+from src.datapack.TxoCache import TxoCache
+from src.ott.OTTUtil import LoadGroup, runInThread, waitFor
 
 
 class DataPackManager:
     notify = DirectNotifyGlobal.directNotify.newCategory('DataPackManager')
     notify.setDebug(True)
 
+    # Nodes found by getModelNode, see ModelCache
+    modelCache = ModelCache()
+    # Textures handed out by getTexture, see TextureCache
+    textureCache = TextureCache()
+    # Processed head parts on disk, see HeadCache
+    headCache = HeadCache()
+    # Decoded and mipmapped textures on disk, see TxoCache
+    txoCache = TxoCache()
+
     @staticmethod
     def getLocalizedText(string: str) -> str:
         """
@@ -23,43 +39,235 @@ class DataPackManager:
         """
         return DPDKGlobal.DKBase.localizer.get(string, string)
 
+    @staticmethod
+    def ensureResource(*paths: str):
+        """
+        Makes sure game resources exist on disk before something loads them.
+        Only does anything in the lazy resource mode, where subfiles are extracted on first use
+
+        :param paths: Paths relative to the resources root
+        """
+        if DPDKGlobal.DKBase.resourceMode == ResourceMode.LAZY:
+            for path in paths:
+                DPDKGlobal.DKBase.lazyExtractor.ensure(path)
+
     @staticmethod
     def getModelNode(modelPath: str, nodePath: Optional[str] = None) -> NodePath:
+        _cached = DataPackManager.modelCache.get(modelPath, nodePath)
+        if _cached is not None:
+            return _cached
+        DataPackManager.ensureResource(modelPath)
         _model = loader.loadModel(modelPath, okMissing = True)
         if not _model:
             DataPackManager.notify.warning(f'Unable to find model {modelPath}')
-            _model = loader.loadModel('phase_3.5/models/props/cube')
-        if nodePath is not None:
-            if _model.find(f'**/{nodePath}').isEmpty():
-                DataPackManager.notify.warning(f'Unable to find node {nodePath} from {_model}')
-                return _model
-            _np: NodePath = _model.find(f'**/{nodePath}')
-            _newNode = NodePath(_np)
-            _model.removeNode()
-            return _newNode
-        return _model
+            DataPackManager.ensureResource('phase_3.5/models/props/cube')
+            return loader.loadModel('phase_3.5/models/props/cube')
+        return DataPackManager.__cacheModelNode(modelPath, nodePath, _model)
+
+    @staticmethod
+    async def getModelNodeAsync(modelPath: str, nodePath: Optional[str] = None, loads: Optional[LoadGroup] = None) -> NodePath:
+        """
+        :param loads: Cancels the load along with the rest of the group
+        """
+        _cached = DataPackManager.modelCache.get(modelPath, nodePath)
+        if _cached is not None:
+            return _cached
+        _model = await DataPackManager.__loadModelAsync(modelPath, loads)
+        if _model is None:
+            return await DataPackManager.__loadMissingModelAsync(loads)
+        return DataPackManager.__cacheModelNode(modelPath, nodePath, _model)
+
+    @staticmethod
+    async def getHeadModelAsync(modelPath: str, nodePath: Optional[str] = None, removeNodes: List[str] = (),
+                                loads: Optional[LoadGroup] = None) -> NodePath:
+        """
+        Gets a head part with its removed nodes already stripped, from the processed head cache when possible.
+        Only the processed head is kept in the model cache
+
+        :param loads: Cancels the load along with the rest of the group
+        """
+        # In the lazy resource mode this also extracts the textures the model uses
+        DataPackManager.ensureResource(modelPath)
+        cachePath = DataPackManager.headCache.getCachePath(modelPath, nodePath, list(removeNodes))
+        if cachePath is None:
+            # Missing model, getModelNodeAsync falls back on the cube
+            return await DataPackManager.getModelNodeAsync(modelPath, nodePath, loads)
+        _cached = DataPackManager.modelCache.get(cachePath, None)
+        if _cached is not None:
+            return _cached
+        if os.path.exists(cachePath):
+            _head = await waitFor(loader.loadModel(Filename.fromOsSpecific(os.path.abspath(cachePath)), okMissing = True,
+                                                   noCache = True, blocking = False), loads)
+            if _head:
+                DataPackManager.headCache.hits += 1
+                return DataPackManager.modelCache.put(cachePath, None, _head)
+        DataPackManager.headCache.misses += 1
+        _model = await DataPackManager.__loadModelAsync(modelPath, loads)
+        if _model is None:
+            return await DataPackManager.__loadMissingModelAsync(loads)
+        _head = DataPackManager.__findModelNode(nodePath, _model)
+        HeadCache.processHead(_head, removeNodes)
+        DataPackManager.headCache.save(cachePath, _head)
+        return DataPackManager.modelCache.put(cachePath, None, _head)
 
     @staticmethod
-    async def getModelNodeAsync(modelPath: str, nodePath: Optional[str] = None) -> NodePath:
-        _model = await loader.loadModel(modelPath, okMissing = True, blocking = False)
+    async def __loadModelAsync(modelPath: str, loads: Optional[LoadGroup]) -> Optional[NodePath]:
+        """
+        :return: The loaded model, not cached, or None if it's missing
+        """
+        DataPackManager.ensureResource(modelPath)
+        _model = await waitFor(loader.loadModel(modelPath, okMissing = True, blocking = False), loads)
         if not _model:
             DataPackManager.notify.warning(f'Unable to find model {modelPath}')
-            _model = await loader.loadModel('phase_3.5/models/props/cube', blocking = False)
-        if nodePath is not None:
-            if _model.find(f'**/{nodePath}').isEmpty():
-                DataPackManager.notify.warning(f'Unable to find node {nodePath} from {_model}')
-                return _model
-            _np: NodePath = _model.find(f'**/{nodePath}')
-            _newNode = NodePath(_np)
-            _model.removeNode()
-            return _newNode
+            return None
         return _model
 
+    @staticmethod
+    async def __loadMissingModelAsync(loads: Optional[LoadGroup]) -> NodePath:
+        DataPackManager.ensureResource('phase_3.5/models/props/cube')
+        return await waitFor(loader.loadModel('phase_3.5/models/props/cube', blocking = False), loads)
+
+    @staticmethod
+    def __findModelNode(nodePath: Optional[str], _model: NodePath) -> NodePath:
+        """
+        :return: The node in the loaded model, the rest of the model is thrown away
+        """
+        if nodePath is None:
+            return _model
+        _np: NodePath = _model.find(f'**/{nodePath}')
+        if _np.isEmpty():
+            DataPackManager.notify.warning(f'Unable to find node {nodePath} from {_model}')
+            return _model
+        _np.detachNode()
+        _model.removeNode()
+        return _np
+
+    @staticmethod
+    def __cacheModelNode(modelPath: str, nodePath: Optional[str], _model: NodePath) -> NodePath:
+        """
+        Finds the node in the loaded model and caches it
+
+        :return: A copy of the node to hand out
+        """
+        return DataPackManager.modelCache.put(modelPath, nodePath, DataPackManager.__findModelNode(nodePath, _model))
+
     @staticmethod
     def getTexture(texturePath: str) -> Texture:
-        _texture = loader.loadTexture(texturePath, okMissing = True)
+        """
+        Gets a texture without referencing it, see acquireTexture.
+        Cached textures already have their sampler state set up, so don't change it
+        """
+        _cached = DataPackManager.textureCache.get(texturePath)
+        if _cached is not None:
+            return _cached
+        DataPackManager.ensureResource(texturePath)
+        _texture = DataPackManager.txoCache.load(texturePath)
         if not _texture:
+            if texturePath == NOT_FOUND_TEXTURE:
+                # There's nothing to fall back on, let the loader complain
+                return loader.loadTexture(texturePath)
+            # Not cached under the missing path, so the texture is picked up if it's added later
             DataPackManager.notify.warning(f'Unable to find texture {texturePath}')
-            _texture = loader.loadTexture('phase_3/maps/ttrm_t_gen_textureNotFound.png')
+            return DataPackManager.getTexture(NOT_FOUND_TEXTURE)
+        DataPackManager.__cacheTexture(texturePath, _texture)
+        return _texture
+
+    @staticmethod
+    async def getTextureAsync(texturePath: str, loads: Optional[LoadGroup] = None) -> Texture:
+        """
+        Same as getTexture, but the texture is read on a worker thread
+
+        :param loads: Cancels the load along with the rest of the group
+        """
+        _cached = DataPackManager.textureCache.get(texturePath)
+        if _cached is not None:
+            return _cached
+        # The lazy extractor isn't thread safe, so this part stays on the main thread
+        DataPackManager.ensureResource(texturePath)
+        _texture = await waitFor(runInThread(DataPackManager.txoCache.load, texturePath), loads)
+        if not _texture:
+            DataPackManager.notify.warning(f'Unable to find texture {texturePath}')
+            return DataPackManager.getTexture(NOT_FOUND_TEXTURE)
+        if texturePath in DataPackManager.textureCache:
+            # Something else loaded it while we were waiting
+            return DataPackManager.textureCache.get(texturePath)
+        DataPackManager.__cacheTexture(texturePath, _texture)
+        return _texture
+
+    @staticmethod
+    def __cacheTexture(texturePath: str, _texture: Texture):
+        _texture.setMinfilter(Texture.FTLinearMipmapLinear)
+        if texturePath == NOT_FOUND_TEXTURE:
             _texture.setMagfilter(Texture.FTNearest)
+        DataPackManager.textureCache.put(texturePath, _texture)
+
+    @staticmethod
+    def acquireTexture(texturePath: str, owner: object, slot: str) -> Texture:
+        """
+        Gets a texture and keeps it loaded for as long as the owner's slot uses it
+
+        :param owner: What is using the texture, e.g. a Cog
+        :param slot: Which of the owner's textures this is, e.g. 'torso'
+        """
+        _texture = DataPackManager.getTexture(texturePath)
+        if texturePath not in DataPackManager.textureCache:
+            texturePath = NOT_FOUND_TEXTURE
+        DataPackManager.textureCache.acquire(texturePath, owner, slot)
         return _texture
+
+    @staticmethod
+    def releaseTextures(owner: object, slot: Optional[str] = None):
+        """
+        :param slot: The slot to release, every slot of the owner if None
+        """
+        DataPackManager.textureCache.release(owner, slot)
+
+    @staticmethod
+    def getResourcesRoot() -> Filename:
+        return Filename.fromOsSpecific(os.path.abspath(DPDKGlobal.DKBase.gameResourcesPath))
+
+    @staticmethod
+    def listResourceFiles(directory: str = '', extensions: Tuple[str, ...] = (), recursive: bool = True) -> List[str]:
+        """
+        Lists game resource files from the subfile catalog, or through the VirtualFileSystem
+        when there is none (dev resources), so it works whichever way the paks are provided
+
+        :param directory: Directory relative to the resources root, e.g. 'phase_3/data'
+        :param extensions: Only list files with these extensions (without the dot), lists everything if empty
+        :param recursive: Also list the contents of subdirectories
+        :return: Sorted file paths relative to the resources root, e.g. 'phase_3/maps/foo.png'
+        """
+        catalog = DPDKGlobal.DKBase.catalog
+        if catalog is not None:
+            if recursive:
+                return catalog.query(prefix = f"{directory.rstrip('/')}/" if directory else '', extensions = extensions)
+            return catalog.query(directory = directory, extensions = extensions)
+
+        # No catalog with dev resources, walk the resources directory instead
+        vfs = VirtualFileSystem.getGlobalPtr()
+        root = DataPackManager.getResourcesRoot().getFullpath().rstrip('/')
+        files = []
+        pending = [Filename(f'{root}/{directory}'.rstrip('/'))]
+        while pending:
+            fileList = vfs.scanDirectory(pending.pop())
+            if fileList is None:
+                continue
+            for i in range(fileList.getNumFiles()):
+                virtualFile = fileList.getFile(i)
+                filename: Filename = virtualFile.getFilename()
+                if virtualFile.isDirectory():
+                    if recursive:
+                        pending.append(filename)
+                elif not extensions or filename.getExtension() in extensions:
+                    files.append(filename.getFullpath()[len(root) + 1:])
+        return sorted(files)
+
+    @staticmethod
+    def readResourceFile(path: str) -> str:
+        """
+        :param path: File path relative to the resources root
+        :return: The file's text contents
+        """
+        DataPackManager.ensureResource(path)
+        vfs = VirtualFileSystem.getGlobalPtr()
+        return vfs.readFile(Filename(DataPackManager.getResourcesRoot(), path), True).decode('utf-8')
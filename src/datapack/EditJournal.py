@@ -0,0 +1,336 @@
+# EditJournal
+# per-pack, append-only journal of the changes made to the pack's appearance files (sdk/journal/<pack>.jsonl)
+# every edit is appended as the fields it changed, with their old and new values, so it's a tiny write
+# that survives a crash, and undoing it is applying the old values again
+# the appearance files themselves are snapshots, written on the background writer a few seconds after
+# the edits settle down, and the journal is compacted down to the undo history once it grows long
+# documents handed to the journal are kept as they are, so they mustn't be changed afterwards
+# journal lines:
+#   {"type": "edit", "seq": 4, "file": "cogs/appearance/x.json", "ops": [{"path": [...], "old": ..., "new": ...}], "merge": false}
+#   {"type": "undo", "seq": 5} / {"type": "redo", "seq": 6}
+#   {"type": "snapshot", "seq": 7} - the appearance files contain everything before this line
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from direct.task.TaskManagerGlobal import taskMgr
+
+from src.ott.WriteBehind import runOnWriter, submitWrite, writeFileAtomic
+
+# [{'path': [...], 'old': ..., 'new': ...}, ...]
+TEditOps = List[Dict[str, Any]]
+# (file, ops) of every edit in an undo step, in the order they were made
+TEditGroup = List[Tuple[str, TEditOps]]
+
+
+def diffDocuments(old: Dict, new: Dict) -> TEditOps:
+    """
+    :return: The fields that differ, heads are compared field by field when the number of heads didn't change
+    """
+    ops = []
+    for key in sorted(set(old) | set(new)):
+        oldValue, newValue = old.get(key), new.get(key)
+        if oldValue == newValue:
+            continue
+        if key == 'head_models' and isinstance(oldValue, list) and isinstance(newValue, list) and len(oldValue) == len(newValue):
+            for i, (oldHead, newHead) in enumerate(zip(oldValue, newValue)):
+                for headKey in sorted(set(oldHead) | set(newHead)):
+                    if oldHead.get(headKey) != newHead.get(headKey):
+                        ops.append({'path': [key, i, headKey], 'old': oldHead.get(headKey), 'new': newHead.get(headKey)})
+        else:
+            ops.append({'path': [key], 'old': oldValue, 'new': newValue})
+    return ops
+
+
+def applyOps(document: Dict, ops: TEditOps, side: str):
+    """
+    :param side: 'new' to apply the edit, 'old' to revert it
+    """
+    # Reverting goes through the ops backwards, the same as undoing them one at a time
+    for op in (ops if side == 'new' else reversed(ops)):
+        target = document
+        for part in op['path'][:-1]:
+            target = target[part]
+        target[op['path'][-1]] = copy.deepcopy(op[side])
+
+
+class EditJournal:
+    notify = DirectNotifyGlobal.directNotify.newCategory('EditJournal')
+    notify.setInfo(True)
+
+    # Edits of the same fields this close together are undone as one, e.g. dragging a spin control
+    MERGE_WINDOW = 1.0
+    # Seconds after the last edit the appearance files are written
+    SNAPSHOT_DELAY = 5.0
+    # Number of journal lines after which the journal is compacted when a snapshot is taken
+    COMPACT_LINES = 2000
+    # Number of undo steps compaction keeps
+    HISTORY_LIMIT = 200
+
+    def __init__(self, packFolder: str, journalPath: str):
+        """
+        :param packFolder: The pack's folder, journaled files are relative to it
+        :param journalPath: e.g. sdk/journal/<pack>.jsonl
+        """
+        self.packFolder: str = packFolder
+        self.journalPath: str = journalPath
+        # Latest contents of every file edited (or opened) this session, relative path -> document
+        self.documents: Dict[str, Dict] = {}
+        # Files with edits that aren't in their snapshot yet
+        self.dirty: set = set()
+        self.undoStack: List[TEditGroup] = []
+        self.redoStack: List[TEditGroup] = []
+        self.nextSeq: int = 0
+        self.numLines: int = 0
+        self.lastEdit: Tuple[float, str, List] | None = None
+        self.taskName: str = f'editJournalSnapshot-{id(self)}'
+        # Whether the journal ends in a line that was cut off
+        self.cutOff: bool = False
+        # Snapshot lines are appended by the writer once the files are on disk
+        self.fileLock = threading.Lock()
+        self.lastSnapshot: Optional[Future] = None
+
+        os.makedirs(os.path.dirname(self.journalPath) or '.', exist_ok = True)
+        self.recover()
+        self.file = open(self.journalPath, 'a')
+        if self.cutOff:
+            # Start the next line on a line of its own
+            self.file.write('\n')
+        if self.dirty:
+            self.notify.info(f'Recovered unsaved edits of {len(self.dirty)} files')
+            self.snapshot()
+
+    def getRelativePath(self, filePath: str) -> str:
+        return os.path.relpath(filePath, self.packFolder).replace('\\', '/')
+
+    def readDocument(self, path: str) -> Optional[Dict]:
+        """
+        :param path: Path relative to the pack folder
+        :return: The latest contents of the file, or None if it can't be read
+        """
+        if path in self.documents:
+            return self.documents[path]
+        try:
+            with open(os.path.join(self.packFolder, path), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def recover(self):
+        """
+        Rebuilds the undo history from the journal and applies the edits
+        that didn't make it into the appearance files before the SDK closed
+        """
+        try:
+            with open(self.journalPath, 'r') as file:
+                lines = file.readlines()
+        except OSError:
+            return
+        self.cutOff = bool(lines) and not lines[-1].endswith('\n')
+        pending: List[Tuple[str, TEditOps, str]] = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line may have been cut off by a crash
+                continue
+            self.numLines += 1
+            self.nextSeq = entry['seq'] + 1
+            if entry['type'] == 'edit':
+                if entry.get('merge') and self.undoStack:
+                    self.undoStack[-1].append((entry['file'], entry['ops']))
+                else:
+                    self.undoStack.append([(entry['file'], entry['ops'])])
+                self.redoStack = []
+                pending.append((entry['file'], entry['ops'], 'new'))
+            elif entry['type'] == 'undo' and self.undoStack:
+                group = self.undoStack.pop()
+                self.redoStack.append(group)
+                pending += [(path, ops, 'old') for path, ops in reversed(group)]
+            elif entry['type'] == 'redo' and self.redoStack:
+                group = self.redoStack.pop()
+                self.undoStack.append(group)
+                pending += [(path, ops, 'new') for path, ops in group]
+            elif entry['type'] == 'snapshot':
+                pending = []
+
+        for path, ops, side in pending:
+            document = self.readDocument(path)
+            if document is None:
+                continue
+            try:
+                applyOps(document, ops, side)
+            except (KeyError, IndexError, TypeError):
+                self.notify.warning(f'Unable to recover an edit of {path}')
+                continue
+            self.documents[path] = document
+            self.dirty.add(path)
+
+    def append(self, entry: Dict):
+        with self.fileLock:
+            entry['seq'] = self.nextSeq
+            self.nextSeq += 1
+            self.numLines += 1
+            self.file.write(json.dumps(entry) + '\n')
+            # On its way to disk before the next edit, so a crash doesn't lose it
+            self.file.flush()
+
+    def track(self, filePath: str, document: Dict):
+        """
+        Sets what a file contains as far as the editor is concerned, later edits are recorded against it
+        """
+        self.documents[self.getRelativePath(filePath)] = document
+
+    def getDocument(self, filePath: str) -> Optional[Dict]:
+        """
+        :return: The latest contents of the file, including edits that aren't in the file yet
+        """
+        document = self.readDocument(self.getRelativePath(filePath))
+        return copy.deepcopy(document) if document is not None else None
+
+    def record(self, filePath: str, document: Dict):
+        """
+        Journals whatever changed since the file was tracked or last recorded
+        """
+        path = self.getRelativePath(filePath)
+        old = self.documents.get(path)
+        self.documents[path] = document
+        if old is None:
+            return
+        ops = diffDocuments(old, document)
+        if not ops:
+            return
+
+        now = time.monotonic()
+        paths = [op['path'] for op in ops]
+        merge = (self.lastEdit is not None and self.undoStack and now - self.lastEdit[0] < self.MERGE_WINDOW
+                 and self.lastEdit[1:] == (path, paths))
+        if merge:
+            self.undoStack[-1].append((path, ops))
+        else:
+            self.undoStack.append([(path, ops)])
+        self.redoStack = []
+        self.lastEdit = (now, path, paths)
+        self.append({'type': 'edit', 'file': path, 'ops': ops, 'merge': bool(merge)})
+        self.markDirty(path)
+
+    def canUndo(self) -> bool:
+        return bool(self.undoStack)
+
+    def canRedo(self) -> bool:
+        return bool(self.redoStack)
+
+    def undo(self) -> List[str]:
+        """
+        :return: Paths (relative to the pack folder) of the files that changed
+        """
+        if not self.undoStack:
+            return []
+        group = self.undoStack.pop()
+        self.redoStack.append(group)
+        self.append({'type': 'undo'})
+        return self.applyGroup(reversed(group), 'old')
+
+    def redo(self) -> List[str]:
+        """
+        :return: Paths (relative to the pack folder) of the files that changed
+        """
+        if not self.redoStack:
+            return []
+        group = self.redoStack.pop()
+        self.undoStack.append(group)
+        self.append({'type': 'redo'})
+        return self.applyGroup(group, 'new')
+
+    def applyGroup(self, group, side: str) -> List[str]:
+        self.lastEdit = None
+        changed = []
+        for path, ops in group:
+            document = self.readDocument(path)
+            if document is None:
+                continue
+            # The old document may still be waiting on the writer
+            document = copy.deepcopy(document)
+            applyOps(document, ops, side)
+            self.documents[path] = document
+            self.markDirty(path)
+            if path not in changed:
+                changed.append(path)
+        return changed
+
+    def markDirty(self, path: str):
+        self.dirty.add(path)
+        # Restarted by every edit, so files are written once the edits settle down
+        taskMgr.remove(self.taskName)
+        taskMgr.doMethodLater(self.SNAPSHOT_DELAY, self.snapshot, self.taskName, extraArgs = [])
+
+    def snapshot(self):
+        """
+        Hands the edited appearance files to the writer, compacting the journal if it's grown long
+        """
+        taskMgr.remove(self.taskName)
+        if self.dirty:
+            writes = [submitWrite(os.path.join(self.packFolder, path), self.documents[path]) for path in sorted(self.dirty)]
+            self.dirty = set()
+            # Runs after the writes, the journal only says the files are up to date once they are
+            self.lastSnapshot = runOnWriter(self.appendSnapshot, writes)
+        if self.numLines > self.COMPACT_LINES and self.waitForSnapshot():
+            self.compact()
+
+    def appendSnapshot(self, writes: List[Future]) -> bool:
+        # Runs on the writer
+        if all(write.result() for write in writes):
+            self.append({'type': 'snapshot'})
+            return True
+        # Whatever wasn't written is replayed from the journal next time
+        self.notify.warning('Unable to write every edited file, keeping their edits in the journal')
+        return False
+
+    def waitForSnapshot(self) -> bool:
+        """
+        Waits for the last snapshot to be written
+
+        :return: Whether the appearance files are up to date
+        """
+        if self.lastSnapshot is not None:
+            written = self.lastSnapshot.result()
+            self.lastSnapshot = None
+            return written
+        return True
+
+    def compact(self):
+        """
+        Rewrites the journal with only the undo history, the appearance files have to be up to date
+        (see waitForSnapshot)
+        """
+        self.undoStack = self.undoStack[-self.HISTORY_LIMIT:]
+        entries = []
+        for group in self.undoStack + list(reversed(self.redoStack)):
+            for i, (path, ops) in enumerate(group):
+                entries.append({'type': 'edit', 'file': path, 'ops': ops, 'merge': i > 0})
+        # Undoing the redo history again puts it back on the redo stack when the journal is read
+        entries += [{'type': 'undo'} for _ in self.redoStack]
+        entries.append({'type': 'snapshot'})
+
+        self.file.close()
+        self.numLines = 0
+        lines = []
+        for entry in entries:
+            entry['seq'] = self.nextSeq
+            self.nextSeq += 1
+            self.numLines += 1
+            lines.append(json.dumps(entry))
+        writeFileAtomic(self.journalPath, ''.join(f'{line}\n' for line in lines))
+        self.file = open(self.journalPath, 'a')
+        self.notify.info(f'Compacted {self.journalPath} to {self.numLines} lines')
+
+    def close(self):
+        self.snapshot()
+        if self.waitForSnapshot():
+            self.compact()
+        self.file.close()
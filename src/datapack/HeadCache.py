@@ -0,0 +1,80 @@
+# HeadCache
+# keeps processed head parts (the node found in the model, with its removed nodes stripped
+# and optionally flattened) on disk as small .bam files, so they don't have to be rebuilt
+# every time a cog is opened or the SDK is restarted
+# entries are keyed by a hash of the source model's fingerprint and the processing options
+import hashlib
+import os
+from typing import List, Optional
+
+from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import (BamFile, BamWriter, ConfigVariableBool, Filename, NodePath, VirtualFileSystem,
+                          getModelPath)
+
+flattenHeadCache = ConfigVariableBool('dpdk-flatten-head-cache', True,
+                                      'Flatten processed head parts before caching them, which reduces the number of Geoms')
+
+HEAD_CACHE_VERSION = 1
+MODEL_EXTENSIONS = ('bam', 'egg', 'egg.pz')
+
+
+class HeadCache:
+    notify = DirectNotifyGlobal.directNotify.newCategory('HeadCache')
+    notify.setInfo(True)
+
+    def __init__(self, directory: str = 'sdk/temp/head_cache'):
+        self.directory: str = directory
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def getSourceFingerprint(modelPath: str) -> Optional[str]:
+        """
+        :return: The resolved model file with its size and timestamp, or None if it can't be found
+        """
+        vfs = VirtualFileSystem.getGlobalPtr()
+        # Models are usually referenced without their extension, the same as the loader does
+        candidates = [modelPath] if Filename(modelPath).getExtension() else [f'{modelPath}.{ext}' for ext in MODEL_EXTENSIONS]
+        for candidate in candidates:
+            filename = Filename(candidate)
+            if vfs.resolveFilename(filename, getModelPath().getValue()):
+                virtualFile = vfs.getFile(filename)
+                return f'{filename.getFullpath()}|{virtualFile.getFileSize()}|{virtualFile.getTimestamp()}'
+        return None
+
+    def getCachePath(self, modelPath: str, nodePath: Optional[str], removeNodes: List[str]) -> Optional[str]:
+        """
+        :return: Where the processed head is cached, or None if the model can't be found
+        """
+        fingerprint = self.getSourceFingerprint(modelPath)
+        if fingerprint is None:
+            return None
+        key = f'{HEAD_CACHE_VERSION}|{fingerprint}|{nodePath}|{"|".join(removeNodes)}|{flattenHeadCache.getValue()}'
+        return os.path.join(self.directory, f'{hashlib.sha1(key.encode("utf-8")).hexdigest()}.bam')
+
+    @staticmethod
+    def processHead(head: NodePath, removeNodes: List[str]):
+        """
+        Strips the removed nodes and flattens what's left, in place
+        """
+        for node in removeNodes:
+            _np = head.find(f'**/{node}')
+            if not _np.isEmpty():
+                _np.removeNode()
+        if flattenHeadCache.getValue():
+            # The head's own transform gets replaced when it's attached anyway, so it mustn't get baked in
+            head.clearTransform()
+            head.flattenStrong()
+
+    def save(self, cachePath: str, head: NodePath):
+        os.makedirs(self.directory, exist_ok = True)
+        tempPath = f'{cachePath}.tmp'
+        bam = BamFile()
+        if not bam.openWrite(Filename.fromOsSpecific(os.path.abspath(tempPath))):
+            self.notify.warning(f'Unable to write {cachePath}')
+            return
+        # Keep texture paths the way the model had them, relative to the model-path
+        bam.getWriter().setFileTextureMode(BamWriter.BTM_unchanged)
+        bam.writeObject(head.node())
+        bam.close()
+        os.replace(tempPath, cachePath)
@@ -0,0 +1,88 @@
+# ModelCache
+# keeps the nodes DataPackManager.getModelNode finds, keyed by (model path, node path),
+# so asking for the same head part again is a cheap copy instead of a load and a find
+# least recently used entries are evicted once the cache goes over its memory budget
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import NodePath, ConfigVariableInt, SceneGraphAnalyzer
+
+modelCacheBudget = ConfigVariableInt('dpdk-model-cache-mb', 64,
+                                     'Memory budget of the DataPackManager model cache, in megabytes. 0 disables the cache.')
+
+TModelKey = Tuple[str, Optional[str]]
+
+
+class ModelCache:
+    notify = DirectNotifyGlobal.directNotify.newCategory('ModelCache')
+    notify.setInfo(True)
+
+    def __init__(self):
+        # key -> (node, estimated size in bytes), least recently used first
+        self.entries: OrderedDict[TModelKey, Tuple[NodePath, int]] = OrderedDict()
+        self.usedBytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @staticmethod
+    def getBudget() -> int:
+        return modelCacheBudget.getValue() << 20
+
+    @staticmethod
+    def estimateSize(node: NodePath) -> int:
+        analyzer = SceneGraphAnalyzer()
+        analyzer.addNode(node.node())
+        # Textures are shared through the TexturePool, so only the geometry counts against the budget
+        return analyzer.getVertexDataSize() + analyzer.getNumNodes() * 256
+
+    def get(self, modelPath: str, nodePath: Optional[str]) -> Optional[NodePath]:
+        """
+        :return: A copy of the cached node, or None if it isn't cached
+        """
+        entry = self.entries.get((modelPath, nodePath))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end((modelPath, nodePath))
+        # The copy gets its own nodes but shares the Geoms with the cached one
+        return NodePath(entry[0].node().copySubgraph())
+
+    def put(self, modelPath: str, nodePath: Optional[str], node: NodePath) -> NodePath:
+        """
+        Caches the node, which mustn't be used by the caller afterwards
+
+        :return: A copy of the node to use instead
+        """
+        budget = self.getBudget()
+        key = (modelPath, nodePath)
+        node.detachNode()
+        size = self.estimateSize(node)
+        if budget and size <= budget:
+            if key in self.entries:
+                self.usedBytes -= self.entries.pop(key)[1]
+            self.entries[key] = (node, size)
+            self.usedBytes += size
+            self.evict(budget)
+        return NodePath(node.node().copySubgraph())
+
+    def evict(self, budget: int):
+        while self.usedBytes > budget and self.entries:
+            _, (node, size) = self.entries.popitem(last = False)
+            node.removeNode()
+            self.usedBytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        for node, _ in self.entries.values():
+            node.removeNode()
+        self.entries.clear()
+        self.usedBytes = 0
+
+    def getStats(self) -> str:
+        lookups = self.hits + self.misses
+        hitRate = self.hits / lookups * 100 if lookups else 0
+        return (f'{len(self.entries)} models, {self.usedBytes / 1048576:.1f} of {self.getBudget() / 1048576:.0f} MB, '
+                f'{self.hits} hits, {self.misses} misses ({hitRate:.0f}% hit rate), {self.evictions} evictions')
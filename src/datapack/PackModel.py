@@ -0,0 +1,177 @@
+# PackModel
+# keeps the parsed summaries of a pack's files in memory, so listing them never reads every file again
+# files are only parsed again when their size or mtime changes, and listeners are told which entries
+# were added, changed or removed so the lists showing them can be updated in place
+# changes are picked up with watchdog when it's installed, otherwise the folder is polled
+import glob
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from direct.task.Task import Task
+from direct.task.TaskManagerGlobal import taskMgr
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# added, changed, removed
+TFolderListener = Callable[[List[str], List[str], List[str]], None]
+
+
+class FolderEntry:
+
+    def __init__(self, key: str, path: str, fingerprint: Tuple[int, int], summary: Optional[Dict[str, Any]]):
+        """
+        :param key: The entry's name, e.g. the appearance file name
+        :param fingerprint: (size, mtime) of the file when it was parsed
+        :param summary: What the list shows about the file, None if it couldn't be parsed
+        """
+        self.key: str = key
+        self.path: str = path
+        self.fingerprint: Tuple[int, int] = fingerprint
+        self.summary: Optional[Dict[str, Any]] = summary
+
+
+class FolderEventHandler(FileSystemEventHandler):
+    """
+    Runs on watchdog's thread, so it only flags the folder for the next check on the main thread
+    """
+
+    def __init__(self, folder: 'WatchedFolder'):
+        super().__init__()
+        self.folder = folder
+
+    def on_any_event(self, event):
+        self.folder.pendingEvents = True
+
+
+class WatchedFolder:
+    notify = DirectNotifyGlobal.directNotify.newCategory('WatchedFolder')
+    notify.setInfo(True)
+
+    # Seconds between checks for watchdog events
+    EVENT_INTERVAL = 0.25
+    # Seconds between scans of the folder without watchdog
+    POLL_INTERVAL = 2.0
+
+    def __init__(self, directory: str, pattern: str, summarize: Callable[[Dict], Dict[str, Any]]):
+        """
+        :param directory: Folder to watch
+        :param pattern: Glob pattern of the files to keep, relative to the folder, e.g. '*.json'
+        :param summarize: Picks what to keep from a parsed file
+        """
+        self.directory: str = directory
+        self.pattern: str = pattern
+        self.summarize: Callable[[Dict], Dict[str, Any]] = summarize
+        self.entries: Dict[str, FolderEntry] = {}
+        self.listeners: List[TFolderListener] = []
+        self.observer = None
+        self.pendingEvents: bool = False
+        self.taskName: str = f'watchedFolder-{id(self)}'
+
+    def getKey(self, path: str) -> str:
+        return os.path.relpath(path, self.directory).replace('\\', '/')
+
+    def parse(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as file:
+                return self.summarize(json.load(file))
+        except (OSError, ValueError, AttributeError):
+            self.notify.warning(f'There was an error loading {path}. Make sure it is formatted correctly.')
+            return None
+
+    def refresh(self) -> bool:
+        """
+        Parses the files that were added or changed since the last refresh, and tells the listeners
+
+        :return: Whether anything changed
+        """
+        added, changed = [], []
+        seen = set()
+        for path in glob.glob(os.path.join(self.directory, self.pattern)):
+            key = self.getKey(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted while we were looking
+                continue
+            seen.add(key)
+            fingerprint = (stat.st_size, stat.st_mtime_ns)
+            entry = self.entries.get(key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                continue
+            self.entries[key] = FolderEntry(key, path, fingerprint, self.parse(path))
+            (added if entry is None else changed).append(key)
+        removed = [key for key in self.entries if key not in seen]
+        for key in removed:
+            del self.entries[key]
+
+        if not (added or changed or removed):
+            return False
+        for listener in self.listeners:
+            listener(sorted(added), sorted(changed), sorted(removed))
+        return True
+
+    def addListener(self, listener: TFolderListener):
+        self.listeners.append(listener)
+
+    def getEntries(self) -> List[FolderEntry]:
+        """
+        :return: Every entry, sorted by key
+        """
+        return [self.entries[key] for key in sorted(self.entries)]
+
+    def startWatching(self):
+        self.stopWatching()
+        os.makedirs(self.directory, exist_ok = True)
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(FolderEventHandler(self), self.directory, recursive = '/' in self.pattern)
+            self.observer.start()
+        interval = self.EVENT_INTERVAL if self.observer is not None else self.POLL_INTERVAL
+        taskMgr.doMethodLater(interval, self.__watch, self.taskName)
+
+    def stopWatching(self):
+        taskMgr.remove(self.taskName)
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer = None
+
+    def __watch(self, task: Task):
+        if self.observer is None or self.pendingEvents:
+            self.pendingEvents = False
+            self.refresh()
+        return task.again
+
+
+def summarizeAppearance(js: Dict) -> Dict[str, Any]:
+    return {'name': js.get('name', '')}
+
+
+def summarizePack(js: Dict) -> Dict[str, Any]:
+    return {'name': js.get('pack_name', ''), 'author': js.get('pack_author', '')}
+
+
+class PackModel:
+    """
+    A pack's files as far as the editor's lists are concerned
+    """
+
+    def __init__(self, packFolder: str):
+        """
+        :param packFolder: The pack's folder name in sdk/packs
+        """
+        self.packFolder: str = packFolder
+        self.appearances = WatchedFolder(f'sdk/packs/{packFolder}/cogs/appearance', '*.json', summarizeAppearance)
+
+    def open(self):
+        self.appearances.refresh()
+        self.appearances.startWatching()
+
+    def close(self):
+        self.appearances.stopWatching()
@@ -0,0 +1,107 @@
+# PackPrefetcher
+# loads everything the cog appearances of a pack use into DataPackManager's caches in the background,
+# so opening any of the pack's cogs doesn't have to wait on loading its heads and textures
+# one asset is loaded at a time, which keeps the loader free for whatever the user is doing
+import glob
+import json
+from typing import List, Optional, Set, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from direct.task.Task import Task
+
+from src.datapack.DataPackManager import DataPackManager
+from src.ott.OTTUtil import LoadGroup, runInThread, waitFor
+
+# (model path, node, removed nodes)
+TPrefetchHead = Tuple[str, Optional[str], Tuple[str, ...]]
+
+
+def collectAppearanceAssets(packFolder: str) -> Tuple[List[TPrefetchHead], List[str]]:
+    """
+    Reads every cog appearance file of a pack
+
+    :param packFolder: The pack's folder name in sdk/packs
+    :return: The heads and texture paths the appearances use
+    """
+    heads: Set[TPrefetchHead] = set()
+    textures: Set[str] = set()
+    for appearance in glob.glob(f'sdk/packs/{packFolder}/cogs/appearance/*.json'):
+        try:
+            with open(appearance, 'r') as file:
+                js = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(js, dict) or not isinstance(js.get('head_models', []), list):
+            PackPrefetcher.notify.warning(f'Skipping {appearance}, it is not formatted correctly')
+            continue
+        for head in js.get('head_models', []):
+            try:
+                if head.get('path'):
+                    entry = (head['path'], head.get('node') or None, tuple(head.get('remove_nodes', [])))
+                    if not all(isinstance(name, str) for name in (entry[0], entry[1] or '', *entry[2])):
+                        raise TypeError
+                    heads.add(entry)
+                if head.get('texture'):
+                    if not isinstance(head['texture'], str):
+                        raise TypeError
+                    textures.add(head['texture'])
+            except (AttributeError, TypeError):
+                # Opening the cog complains about it, the rest of the appearance can still be prefetched
+                PackPrefetcher.notify.warning(f'Skipping a malformed head in {appearance}')
+        if not js.get('is_skeleton', False):
+            for key in ('torso_texture', 'arm_texture', 'leg_texture'):
+                if js.get(key) and isinstance(js[key], str):
+                    textures.add(js[key])
+    return sorted(heads, key = lambda head: (head[0], head[1] or '', head[2])), sorted(textures)
+
+
+class PackPrefetcher:
+    notify = DirectNotifyGlobal.directNotify.newCategory('PackPrefetcher')
+    notify.setInfo(True)
+
+    def __init__(self):
+        self.task: Task | None = None
+        # Removing the task doesn't stop the load it's waiting on, cancelling the group does
+        self.loads: LoadGroup | None = None
+
+    def start(self, packFolder: str):
+        """
+        Starts prefetching a pack's assets, stopping whatever was being prefetched before
+        """
+        self.stop()
+        self.loads = LoadGroup()
+        self.task = taskMgr.add(self.loads.run(self.__prefetch(packFolder, self.loads)), 'packPrefetch')
+
+    def stop(self):
+        if self.loads is not None:
+            self.loads.cancel()
+            self.loads = None
+        if self.task is not None:
+            self.task.remove()
+            self.task = None
+
+    async def __prefetch(self, packFolder: str, loads: LoadGroup):
+        assets = await waitFor(runInThread(collectAppearanceAssets, packFolder), loads)
+        if assets is None:
+            # The traceback was already printed by runInThread
+            self.notify.warning(f'Unable to read the appearances of {packFolder}, not prefetching it')
+            self.task = self.loads = None
+            return
+        heads, textures = assets
+        for modelPath, nodePath, removeNodes in heads:
+            if loads.cancelled:
+                return
+            # Builds the processed head (or reads it from disk) the same way opening the cog would
+            _head = await DataPackManager.getHeadModelAsync(modelPath, nodePath, list(removeNodes), loads)
+            # Only the cached copy is wanted
+            _head.removeNode()
+            # Give the frame back between assets
+            await Task.pause(0)
+        for texturePath in textures:
+            if loads.cancelled:
+                return
+            if texturePath not in DataPackManager.textureCache:
+                await DataPackManager.getTextureAsync(texturePath, loads)
+                await Task.pause(0)
+        self.notify.info(f'Prefetched {len(heads)} head models and {len(textures)} textures for {packFolder}')
+        self.task = self.loads = None
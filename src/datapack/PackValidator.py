@@ -0,0 +1,214 @@
+# PackValidator
+# checks every model, node and texture the cog appearances of a pack (and the game's default ones) reference,
+# without loading anything into the scene: models are read on a process pool with the core Loader and
+# textures are only checked for existence
+# the node names of each model are kept in an index on disk keyed by the model's path, size and timestamp,
+# so validating again only reads the models that changed
+import fnmatch
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import Filename, Loader, LoaderOptions, NodePath, VirtualFileSystem, loadPrcFileData
+
+from src.datapack.HeadCache import MODEL_EXTENSIONS
+
+NODE_INDEX_VERSION = 1
+TEXTURE_BATCH_SIZE = 64
+
+# (model path, node path) or texture path, and where it's referenced from: (appearance, field)
+TReferenceSource = Tuple[str, str]
+
+
+class BrokenReference(NamedTuple):
+    appearance: str
+    field: str
+    reference: str
+    problem: str
+
+    def __str__(self) -> str:
+        return f'{self.appearance}: {self.field} "{self.reference}" {self.problem}'
+
+
+def initValidatorWorker(paks: List[str], mountPoint: str):
+    """
+    Runs once in each worker process, which starts without the paks the SDK mounted
+    """
+    # Only the node names are wanted, not the images of the textures the models use
+    loadPrcFileData('validator worker', 'preload-textures 0')
+    vfs = VirtualFileSystem.getGlobalPtr()
+    for multifile in paks:
+        vfs.mount(Filename.fromOsSpecific(multifile), Filename.fromOsSpecific(mountPoint), VirtualFileSystem.MFReadOnly)
+
+
+def resolveResource(roots: List[str], path: str, extensions: Tuple[str, ...] = ()) -> Optional[Filename]:
+    """
+    :param roots: Directories to look in, in order
+    :param extensions: Extensions to try when the path doesn't have one
+    :return: The resolved file, or None if it doesn't exist in any of the roots
+    """
+    vfs = VirtualFileSystem.getGlobalPtr()
+    candidates = [path] if not extensions or Filename(path).getExtension() else [f'{path}.{ext}' for ext in extensions]
+    for root in roots:
+        for candidate in candidates:
+            filename = Filename(Filename.fromOsSpecific(root), candidate)
+            if vfs.exists(filename):
+                return filename
+    return None
+
+
+def indexModel(roots: List[str], modelPath: str, knownFingerprint: Optional[str]) -> Tuple[Optional[str], Optional[List[str]]]:
+    """
+    Reads the names of every node in a model, runs on a worker process
+
+    :param knownFingerprint: The fingerprint the index has for the model, if any
+    :return: The model's fingerprint (None if it's missing) and its node names (None if the fingerprint didn't change)
+    """
+    filename = resolveResource(roots, modelPath, MODEL_EXTENSIONS)
+    if filename is None:
+        return None, None
+    virtualFile = VirtualFileSystem.getGlobalPtr().getFile(filename)
+    fingerprint = f'{filename.getFullpath()}|{virtualFile.getFileSize()}|{virtualFile.getTimestamp()}'
+    if fingerprint == knownFingerprint:
+        return fingerprint, None
+    node = Loader.getGlobalPtr().loadSync(filename, LoaderOptions(LoaderOptions.LF_no_cache))
+    if node is None:
+        # Exists but can't be read, the same as missing as far as the game is concerned
+        return None, None
+    # find('**/name') only matches below the model's root
+    return fingerprint, sorted({match.getName() for match in NodePath(node).findAllMatches('**/*')})
+
+
+def findMissingTextures(roots: List[str], texturePaths: List[str]) -> List[str]:
+    return [texturePath for texturePath in texturePaths if resolveResource(roots, texturePath) is None]
+
+
+def hasNode(nodeNames: List[str], nodePath: str) -> bool:
+    """
+    Whether find(f'**/{nodePath}') can match, every part of the path has to match a node name
+    """
+    return all(any(fnmatch.fnmatchcase(name, part) for name in nodeNames) for part in nodePath.split('/') if part not in ('', '**'))
+
+
+def collectReferences(appearance: str, js: Dict, models: Dict[Tuple[str, Optional[str]], List[TReferenceSource]],
+                      textures: Dict[str, List[TReferenceSource]]):
+    """
+    Adds the models and textures an appearance file references to models and textures
+    """
+    for i, head in enumerate(js.get('head_models', [])):
+        if head.get('path'):
+            models.setdefault((head['path'], head.get('node') or None), []).append((appearance, f'head_models[{i}]'))
+        if head.get('texture'):
+            textures.setdefault(head['texture'], []).append((appearance, f'head_models[{i}].texture'))
+    if not js.get('is_skeleton', False):
+        for key in ('torso_texture', 'arm_texture', 'leg_texture'):
+            if js.get(key):
+                textures.setdefault(js[key], []).append((appearance, key))
+
+
+class PackValidator:
+    notify = DirectNotifyGlobal.directNotify.newCategory('PackValidator')
+    notify.setInfo(True)
+
+    def __init__(self, resourcesRoot: str, paks: List[str], workers: Optional[int] = None,
+                 indexPath: str = 'sdk/temp/node_index.json'):
+        """
+        :param resourcesRoot: Directory the game resources are extracted to or mounted over
+        :param paks: Paks the workers have to mount over resourcesRoot, empty if the resources are extracted
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        """
+        self.resourcesRoot: str = os.path.abspath(resourcesRoot)
+        self.indexPath: str = indexPath
+        self.pool = ProcessPoolExecutor(max_workers = workers, initializer = initValidatorWorker,
+                                        initargs = (paks, self.resourcesRoot))
+        # model path -> {'fingerprint': ..., 'nodes': [...]}
+        self.nodeIndex: Dict[str, Dict] = self.loadIndex()
+
+    def loadIndex(self) -> Dict[str, Dict]:
+        try:
+            with open(self.indexPath, 'r') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != NODE_INDEX_VERSION:
+            return {}
+        return index.get('models', {})
+
+    def saveIndex(self):
+        os.makedirs(os.path.dirname(self.indexPath), exist_ok = True)
+        tempPath = f'{self.indexPath}.tmp'
+        with open(tempPath, 'w') as file:
+            json.dump({'version': NODE_INDEX_VERSION, 'models': self.nodeIndex}, file)
+        os.replace(tempPath, self.indexPath)
+
+    def validate(self, appearances: Dict[str, str], packFolder: Optional[str] = None) -> List[BrokenReference]:
+        """
+        Blocks until every reference is checked, so call it from a worker thread
+
+        :param appearances: Appearance name (e.g. its path) -> its JSON text
+        :param packFolder: The pack's folder, its own files are looked up before the game resources
+        :return: Every broken reference, sorted by appearance
+        """
+        startTime = time.perf_counter()
+        roots = [os.path.abspath(packFolder), self.resourcesRoot] if packFolder else [self.resourcesRoot]
+        broken: List[BrokenReference] = []
+        models: Dict[Tuple[str, Optional[str]], List[TReferenceSource]] = {}
+        textures: Dict[str, List[TReferenceSource]] = {}
+        for appearance, text in appearances.items():
+            try:
+                collectReferences(appearance, json.loads(text), models, textures)
+            except (ValueError, AttributeError) as e:
+                broken.append(BrokenReference(appearance, 'file', appearance, f'is not a valid appearance file ({e})'))
+
+        modelPaths = sorted({modelPath for modelPath, _ in models})
+        modelFutures = {modelPath: self.pool.submit(indexModel, roots, modelPath,
+                                                    self.nodeIndex.get(modelPath, {}).get('fingerprint'))
+                        for modelPath in modelPaths}
+        texturePaths = sorted(textures)
+        textureFutures = [self.pool.submit(findMissingTextures, roots, texturePaths[i:i + TEXTURE_BATCH_SIZE])
+                          for i in range(0, len(texturePaths), TEXTURE_BATCH_SIZE)]
+
+        missingModels = set()
+        for modelPath, future in modelFutures.items():
+            fingerprint, nodeNames = future.result()
+            if fingerprint is None:
+                missingModels.add(modelPath)
+                self.nodeIndex.pop(modelPath, None)
+            elif nodeNames is not None:
+                self.nodeIndex[modelPath] = {'fingerprint': fingerprint, 'nodes': nodeNames}
+
+        for (modelPath, nodePath), sources in models.items():
+            if modelPath in missingModels:
+                broken += [BrokenReference(appearance, f'{field}.path', modelPath, 'does not exist')
+                           for appearance, field in sources]
+            elif nodePath is not None and not hasNode(self.nodeIndex[modelPath]['nodes'], nodePath):
+                broken += [BrokenReference(appearance, f'{field}.node', nodePath, f'is not in {modelPath}')
+                           for appearance, field in sources]
+
+        for future in textureFutures:
+            for texturePath in future.result():
+                broken += [BrokenReference(appearance, field, texturePath, 'does not exist')
+                           for appearance, field in textures[texturePath]]
+
+        self.saveIndex()
+        self.notify.info(f'Checked {len(appearances)} appearances ({len(modelPaths)} models, {len(texturePaths)} textures) '
+                         f'in {time.perf_counter() - startTime:.2f}s, {len(broken)} broken references')
+        return sorted(broken)
+
+    @staticmethod
+    def readPackAppearances(packFolder: str) -> Dict[str, str]:
+        """
+        :param packFolder: Path to the pack's folder
+        """
+        appearances = {}
+        for path in sorted(glob.glob(f'{packFolder}/cogs/appearance/*.json')):
+            with open(path, 'r') as file:
+                appearances[os.path.relpath(path, packFolder).replace('\\', '/')] = file.read()
+        return appearances
+
+    def shutdown(self):
+        self.pool.shutdown(wait = False, cancel_futures = True)
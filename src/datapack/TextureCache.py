@@ -0,0 +1,122 @@
+# TextureCache
+# keeps the textures DataPackManager hands out, with their sampler state already set up when they were loaded,
+# so setting the same texture again never touches the filters (which makes Panda regenerate the mipmaps)
+# textures are reference counted per (owner, slot), e.g. a cog's torso or one of its head parts,
+# and unreferenced ones are released from the TexturePool once the cache goes over its memory budget
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import Texture, TexturePool, ConfigVariableInt
+
+textureCacheBudget = ConfigVariableInt('dpdk-texture-cache-mb', 256,
+                                       'Memory budget of the DataPackManager texture cache, in megabytes. '
+                                       'Only textures nothing is using get released to stay under it.')
+
+TTextureSlot = Tuple[int, str]
+
+
+class TextureEntry:
+
+    def __init__(self, texture: Texture):
+        self.texture: Texture = texture
+        self.refCount: int = 0
+        self.size: int = texture.estimateTextureMemory()
+
+
+class TextureCache:
+    notify = DirectNotifyGlobal.directNotify.newCategory('TextureCache')
+    notify.setInfo(True)
+
+    def __init__(self):
+        # path -> entry, least recently used first
+        self.entries: OrderedDict[str, TextureEntry] = OrderedDict()
+        # (id(owner), slot) -> path the slot is using
+        self.slots: Dict[TTextureSlot, str] = {}
+        self.residentBytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @staticmethod
+    def getBudget() -> int:
+        return textureCacheBudget.getValue() << 20
+
+    def __contains__(self, texturePath: str) -> bool:
+        return texturePath in self.entries
+
+    def get(self, texturePath: str) -> Optional[Texture]:
+        """
+        :return: The cached texture, or None if it isn't cached
+        """
+        entry = self.entries.get(texturePath)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(texturePath)
+        return entry.texture
+
+    def put(self, texturePath: str, texture: Texture):
+        """
+        Caches a texture, its sampler state should be set up already
+        """
+        entry = TextureEntry(texture)
+        old = self.entries.pop(texturePath, None)
+        if old is not None:
+            entry.refCount = old.refCount
+            self.residentBytes -= old.size
+        self.entries[texturePath] = entry
+        self.residentBytes += entry.size
+        # The new texture is about to be used, so it isn't a candidate
+        self.evict(keep = texturePath)
+
+    def acquire(self, texturePath: str, owner: object, slot: str):
+        """
+        References a cached texture from the owner's slot, releasing whatever the slot used before
+
+        :param owner: What is using the texture, e.g. a Cog
+        :param slot: Which of the owner's textures this is, e.g. 'torso'
+        """
+        self.entries[texturePath].refCount += 1
+        self.release(owner, slot)
+        self.slots[(id(owner), slot)] = texturePath
+
+    def release(self, owner: object, slot: Optional[str] = None):
+        """
+        :param slot: The slot to release, every slot of the owner if None
+        """
+        if slot is None:
+            keys = [key for key in self.slots if key[0] == id(owner)]
+        else:
+            keys = [(id(owner), slot)]
+        for key in keys:
+            texturePath = self.slots.pop(key, None)
+            if texturePath in self.entries:
+                self.entries[texturePath].refCount -= 1
+        # Only does anything when over budget
+        self.evict()
+
+    def evict(self, keep: Optional[str] = None):
+        budget = self.getBudget()
+        if self.residentBytes <= budget:
+            return
+        for texturePath in list(self.entries):
+            if self.residentBytes <= budget:
+                break
+            entry = self.entries[texturePath]
+            if entry.refCount > 0 or texturePath == keep:
+                continue
+            del self.entries[texturePath]
+            TexturePool.releaseTexture(entry.texture)
+            self.residentBytes -= entry.size
+            self.evictions += 1
+
+    def getResidentBytes(self) -> int:
+        return self.residentBytes
+
+    def getStats(self) -> str:
+        referenced = sum(1 for entry in self.entries.values() if entry.refCount > 0)
+        return (f'{len(self.entries)} textures ({referenced} in use), {self.residentBytes / 1048576:.1f} of '
+                f'{self.getBudget() / 1048576:.0f} MB resident, {self.hits} hits, {self.misses} misses, '
+                f'{self.evictions} evictions')
@@ -0,0 +1,90 @@
+# TxoCache
+# keeps decoded textures on disk as .txo files with their mipmaps already generated (and optionally compressed),
+# so loading a texture that was loaded before skips decoding the image and building its mipmaps
+# entries are keyed by a fingerprint of the source image (resolved path, size, mtime and ctime) rather than a hash
+# of its contents, so a cache hit only has to stat the image
+# ctime (inode change time, creation time on Windows) is new for an image restored from an archive or copied with
+# its mtime kept, so those are processed again too. images inside mounted paks only have their subfile timestamp
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import ConfigVariableBool, Filename, LoaderOptions, Texture, TexturePool, VirtualFileSystem, getModelPath
+
+compressTxoCache = ConfigVariableBool('dpdk-compress-texture-cache', False,
+                                      'Compress the textures in the .txo cache (lossy, but uses less video memory)')
+
+TXO_CACHE_VERSION = 3
+
+
+class TxoCache:
+    notify = DirectNotifyGlobal.directNotify.newCategory('TxoCache')
+    notify.setInfo(True)
+
+    def __init__(self, directory: str = 'sdk/temp/texture_cache'):
+        self.directory: str = directory
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def getCachePath(self, texturePath: str) -> Optional[str]:
+        """
+        :return: Where the processed texture is cached, or None if the texture can't be found
+        """
+        vfs = VirtualFileSystem.getGlobalPtr()
+        filename = Filename(texturePath)
+        if not vfs.resolveFilename(filename, getModelPath().getValue()):
+            return None
+        osPath = filename.toOsSpecific()
+        if os.path.isfile(osPath):
+            stat = os.stat(osPath)
+            fingerprint = f'{stat.st_size}|{stat.st_mtime_ns}|{stat.st_ctime_ns}'
+        else:
+            virtualFile = vfs.getFile(filename)
+            if virtualFile is None:
+                return None
+            fingerprint = f'{virtualFile.getFileSize()}|{virtualFile.getTimestamp()}'
+        key = f'{TXO_CACHE_VERSION}|{filename.getFullpath()}|{fingerprint}|{compressTxoCache.getValue()}'
+        return os.path.join(self.directory, f'{hashlib.sha1(key.encode("utf-8")).hexdigest()}.txo')
+
+    def load(self, texturePath: str) -> Optional[Texture]:
+        """
+        Loads a texture from the cache, processing and caching it first if it isn't cached yet.
+        Safe to call from a worker thread
+
+        :return: The texture, or None if it can't be found
+        """
+        cachePath = self.getCachePath(texturePath)
+        if cachePath is None:
+            return None
+        # preload-textures is off in sdk.prc, but the point of loading on a worker is having the image read there,
+        # and a new entry needs the image in memory to build its mipmaps
+        options = LoaderOptions(LoaderOptions.LF_search | LoaderOptions.LF_report_errors, LoaderOptions.TF_preload)
+        if os.path.exists(cachePath):
+            texture = TexturePool.loadTexture(Filename.fromOsSpecific(os.path.abspath(cachePath)), 0, False, options)
+            if texture:
+                self.hits += 1
+                return texture
+
+        self.misses += 1
+        texture = TexturePool.loadTexture(Filename(texturePath), 0, False, options)
+        if not texture:
+            return None
+        if not texture.hasRamImage():
+            # Already in the TexturePool without its image
+            texture.reload()
+            if not texture.hasRamImage():
+                self.notify.warning(f'Unable to read {texturePath}')
+                return None
+        texture.generateRamMipmapImages()
+        if compressTxoCache.getValue():
+            texture.compressRamImage()
+        os.makedirs(self.directory, exist_ok = True)
+        # Texture.write picks the format from the extension, so the temp file has to end in .txo too
+        tempPath = f'{cachePath[:-4]}.{threading.get_ident()}.tmp.txo'
+        if texture.write(Filename.fromOsSpecific(os.path.abspath(tempPath))):
+            os.replace(tempPath, cachePath)
+        else:
+            self.notify.warning(f'Unable to cache {texturePath}')
+        return texture
@@ -1,7 +1,15 @@
 """
 Helpers and such for Open Toontown Tools
 """
+import traceback
+from concurrent.futures import CancelledError, ThreadPoolExecutor, Future
+from typing import Any, Awaitable, Callable, List, Optional
+
 from direct.task.TaskManagerGlobal import taskMgr
+from panda3d.core import AsyncFuture
+
+# Shared by everything that uses runInThread
+_threadPool = ThreadPoolExecutor(max_workers = 4, thread_name_prefix = 'OTTWorker')
 
 
 def sleep(duration: float):
@@ -20,6 +28,82 @@ def sleep(duration: float):
     return taskMgr.add(__task)
 
 
+def runInThread(func: Callable, *args) -> AsyncFuture:
+    """
+    Runs a function on a worker thread. Returns an awaitable for its result,
+    which is None if the function raised (the exception is printed).
+
+    :param func: Function to run, must be safe to call off the main thread
+    """
+    result = AsyncFuture()
+
+    def __done(future: Future):
+        if result.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            traceback.print_exception(type(exception), exception, exception.__traceback__)
+            result.setResult(None)
+        else:
+            result.setResult(future.result())
+
+    _threadPool.submit(func, *args).add_done_callback(__done)
+    return result
+
+
+class LoadGroup:
+    """
+    Loads that are cancelled together, e.g. everything a cog head part waits on.
+    Removing a task that is awaiting a load doesn't stop the load (or the task), so the loads are awaited
+    through the group, and cancelling it cancels whatever they're waiting on
+    """
+
+    def __init__(self):
+        self.futures: List[Any] = []
+        self.cancelled: bool = False
+
+    async def wait(self, future) -> Any:
+        """
+        Awaits a load, raises CancelledError if the group is cancelled before or while waiting
+
+        :param future: An AsyncFuture, or what loader.loadModel returns with blocking = False
+        """
+        if self.cancelled:
+            future.cancel()
+            raise CancelledError
+        self.futures.append(future)
+        try:
+            result = await future
+        finally:
+            self.futures.remove(future)
+        if self.cancelled:
+            raise CancelledError
+        return result
+
+    async def run(self, coroutine: Awaitable) -> Any:
+        """
+        Awaits a coroutine that waits on the group, the result is None if the group was cancelled
+        """
+        try:
+            return await coroutine
+        except CancelledError:
+            return None
+
+    def cancel(self):
+        self.cancelled = True
+        for future in list(self.futures):
+            future.cancel()
+
+
+async def waitFor(future, loads: Optional[LoadGroup] = None) -> Any:
+    """
+    Awaits a load, through the group if there is one
+    """
+    if loads is not None:
+        return await loads.wait(future)
+    return await future
+
+
 def toAlphaNumeric(string: str) -> str:
     finalstr: str = ''
     for char in string:
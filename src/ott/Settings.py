@@ -1,14 +1,25 @@
 """
 OpenTTTools Settings
 Slight override of a typical dict to make the file auto save when a change is made
+
+Changes are saved write-behind (see WriteBehind), and changes made inside of batch() are saved together.
+The file is checked for outside edits at most once a second, and only parsed again when it changed.
 """
 
-import collections
-import toml
+import collections.abc
+import copy
 import os
+import time
+from contextlib import contextmanager
+
+import toml
+
+from src.ott.WriteBehind import WriteBehind
 
 
-class Settings(collections.MutableMapping):
+class Settings(collections.abc.MutableMapping):
+    # Seconds between checks of the file for outside edits
+    WATCH_INTERVAL = 1.0
 
     def __init__(self, filename: str):
         """
@@ -17,26 +28,95 @@ class Settings(collections.MutableMapping):
         self.filename = filename
 
         self.data = {}
+        # Number of changes made since the settings were created, e.g. to tell if anything changed since
+        self.changeCount: int = 0
+        self.batchDepth: int = 0
+        self.batchChanged: bool = False
+        self.autosave = WriteBehind(serialize = toml.dumps, onWritten = self.written)
+        # mtime of the file when it was last read, and when it was last checked
+        self.loadedMtime: int | None = None
+        self.lastCheck: float = 0
 
         # Make sure the file exists
         if os.path.exists(self.filename):
             try:
-                with open(self.filename, 'r') as f:
-                    self.data = toml.load(f)
+                self.load()
             except:
                 # Something went wrong with the file, probable corruption, make a new one
                 self.save()
+                self.flush()
         # If not, create it
         else:
             self.save()
+            self.flush()
+
+    def load(self):
+        mtime = os.stat(self.filename).st_mtime_ns
+        with open(self.filename, 'r') as f:
+            self.data = toml.load(f)
+        self.loadedMtime = mtime
+
+    def checkForEdits(self):
+        """
+        Reloads the file if it was edited outside of the SDK, doesn't do anything if it was checked less than a second ago
+        """
+        now = time.monotonic()
+        if now - self.lastCheck < self.WATCH_INTERVAL:
+            return
+        self.lastCheck = now
+        # Our own changes win over the file until they're written
+        if self.autosave.isDirty() or self.autosave.isWriting() or self.batchDepth:
+            return
+        try:
+            if os.stat(self.filename).st_mtime_ns != self.loadedMtime:
+                self.load()
+        except (OSError, toml.TomlDecodeError):
+            # Missing or half edited, keep what we have
+            pass
 
     def save(self):
         """
-        Write settings changes to the json file
+        Schedules the settings to be written to the file
+        """
+        if self.batchDepth:
+            self.batchChanged = True
+            return
+        # Snapshot the settings when they're written, so the writer never sees them change
+        self.autosave.markDirty(self.filename, lambda: copy.deepcopy(self.data))
+
+    def flush(self):
+        """
+        Writes pending changes to the file and waits for them
         """
-        with open(self.filename, 'w') as tomlFile:
-            toml.dump(self.data, tomlFile)
-            print('Saved settings')
+        self.autosave.flush()
+
+    def written(self, path: str):
+        """
+        Runs on the writer once our own changes are on disk, so they aren't mistaken for an outside edit
+        """
+        try:
+            self.loadedMtime = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+
+    @contextmanager
+    def batch(self):
+        """
+        with settings.batch(): groups changes so the file is only saved once, after the last of them.
+        Batches can be nested, the file is saved when the outermost one ends
+        """
+        self.batchDepth += 1
+        try:
+            yield self
+        finally:
+            self.batchDepth -= 1
+            if not self.batchDepth and self.batchChanged:
+                self.batchChanged = False
+                self.save()
+
+    def changed(self):
+        self.changeCount += 1
+        self.save()
 
     ''' Overrides '''
 
@@ -47,6 +127,7 @@ class Settings(collections.MutableMapping):
         :param key: Setting Key
         :return: Setting value
         """
+        self.checkForEdits()
         return self.data[key]
 
     def __setitem__(self, key: str, value: str):
@@ -58,7 +139,7 @@ class Settings(collections.MutableMapping):
         """
         self.data[key] = value
         # Save the file
-        self.save()
+        self.changed()
 
     def __delitem__(self, key: str):
         """
@@ -68,7 +149,7 @@ class Settings(collections.MutableMapping):
         """
         del self.data[key]
         # Save the file
-        self.save()
+        self.changed()
 
     def __iter__(self):
         """
@@ -76,6 +157,7 @@ class Settings(collections.MutableMapping):
 
         :return: Iterable of settings
         """
+        self.checkForEdits()
         return iter(self.data)
 
     def __len__(self) -> int:
@@ -84,4 +166,9 @@ class Settings(collections.MutableMapping):
 
         :return: Number of settings as integer
         """
+        self.checkForEdits()
         return len(self.data)
+
+    def __contains__(self, key) -> bool:
+        self.checkForEdits()
+        return key in self.data
@@ -0,0 +1,116 @@
+"""
+Write-behind saving for Open Toontown Tools
+Changes only mark a file dirty, the file is written once per save window on a background writer.
+"""
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.task.TaskManagerGlobal import taskMgr
+
+# A single writer, so writes to the same file land in the order they were made
+_writer = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'OTTWriter')
+
+
+def writeFileAtomic(path: str, text: str):
+    """
+    Writes to a temp file next to the file and renames it over the file,
+    so the file is never left half written
+    """
+    tempPath = f'{path}.tmp'
+    with open(tempPath, 'w') as file:
+        file.write(text)
+    os.replace(tempPath, path)
+
+
+def toJsonText(data: Any) -> str:
+    return json.dumps(data, indent = 4)
+
+
+def runOnWriter(func: Callable, *args) -> Future:
+    """
+    Runs a function on the writer, after the writes submitted before it
+    """
+    return _writer.submit(func, *args)
+
+
+def submitWrite(path: str, data: Any, serialize: Callable[[Any], str] = toJsonText,
+                onWritten: Optional[Callable[[str], None]] = None) -> Future:
+    """
+    Writes a file on the writer without waiting for it, the data mustn't change until it's written
+
+    :return: Resolves to whether the file was written
+    """
+    return _writer.submit(_write, path, data, serialize, onWritten)
+
+
+def _write(path: str, data: Any, serialize: Callable[[Any], str], onWritten: Optional[Callable[[str], None]]) -> bool:
+    try:
+        writeFileAtomic(path, serialize(data))
+    except (OSError, TypeError, ValueError) as e:
+        WriteBehind.notify.warning(f'Unable to save {path}: {e}')
+        return False
+    WriteBehind.notify.debug(f'Saved {path}')
+    if onWritten is not None:
+        onWritten(path)
+    return True
+
+
+class WriteBehind:
+    notify = directNotify.newCategory('WriteBehind')
+    notify.setInfo(True)
+
+    def __init__(self, serialize: Callable[[Any], str] = toJsonText, delay: float = 0.5,
+                 onWritten: Optional[Callable[[str], None]] = None):
+        """
+        :param serialize: Turns a snapshot into the file's text, runs on the writer
+        :param delay: Seconds changes are coalesced for before the file is written
+        :param onWritten: Called with the path after each successful write, runs on the writer
+        """
+        self.serialize: Callable[[Any], str] = serialize
+        self.delay: float = delay
+        self.onWritten: Optional[Callable[[str], None]] = onWritten
+        self.path: Optional[str] = None
+        self.snapshot: Optional[Callable[[], Any]] = None
+        self.lastWrite: Optional[Future] = None
+        self.taskName: str = f'writeBehind-{id(self)}'
+
+    def isDirty(self) -> bool:
+        return self.path is not None
+
+    def isWriting(self) -> bool:
+        return self.lastWrite is not None and not self.lastWrite.done()
+
+    def markDirty(self, path: str, snapshot: Callable[[], Any]):
+        """
+        Schedules the file to be written once the save window is over
+
+        :param snapshot: Gets what to write, called once when the window is over
+        """
+        if self.path is not None and self.path != path:
+            self.save()
+        self.path, self.snapshot = path, snapshot
+        if not taskMgr.hasTaskNamed(self.taskName):
+            taskMgr.doMethodLater(self.delay, self.save, self.taskName, extraArgs = [])
+
+    def save(self):
+        """
+        Hands the pending write to the writer without waiting for it
+        """
+        taskMgr.remove(self.taskName)
+        if self.path is None:
+            return
+        path, data = self.path, self.snapshot()
+        self.path = self.snapshot = None
+        self.lastWrite = submitWrite(path, data, self.serialize, self.onWritten)
+
+    def flush(self):
+        """
+        Writes whatever is pending and waits until it's on disk
+        """
+        self.save()
+        if self.lastWrite is not None:
+            self.lastWrite.result()
+            self.lastWrite = None
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
-import json
-
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 from direct.actor.Actor import Actor
-from panda3d.core import PartBundle, Texture, NodePath, VBase4, TransparencyAttrib, TextNode, BillboardEffect, Vec3
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import PartBundle, NodePath, VBase4, TransparencyAttrib, TextNode, BillboardEffect, Vec3
 
-from src.base import DPDKGlobal
 from src.base.ToontownTypes import TCogHead
 from src.datapack.DataPackManager import DataPackManager
+from src.datapack.EditJournal import EditJournal
+from src.ott.OTTUtil import LoadGroup
+from src.pandaview.MemoryStats import NodeStats, combineStats, measureNode
 
 COG_MODELS = (
     'phase_3.5/models/char/suitA-mod.bam',
@@ -28,12 +29,65 @@ IDLE_ANIMS = (
 )
 
 
+class CogBodyPool:
+    """
+    Every body model and idle animation, loaded once in the background so switching
+    body types (or to a skelecog) copies one that's already in memory instead of loading it
+    """
+    notify = directNotify.newCategory('CogBodyPool')
+    notify.setInfo(True)
+
+    models: Dict[str, NodePath] = {}
+    anims: Dict[str, NodePath] = {}
+
+    @staticmethod
+    async def prewarm():
+        modelPaths = [path for path in COG_MODELS + SKELECOG_MODELS if path not in CogBodyPool.models]
+        animPaths = [path for path in IDLE_ANIMS if path not in CogBodyPool.anims]
+        if not modelPaths and not animPaths:
+            return
+        # The lazy extractor isn't thread safe, so this stays on the main thread
+        DataPackManager.ensureResource(*modelPaths, *animPaths)
+        # All of them load at the same time on the loader thread
+        loaded = await loader.loadModel(modelPaths + animPaths, okMissing = True, blocking = False)
+        for path, model in zip(modelPaths + animPaths, loaded):
+            if not model or (path in animPaths and model.find('**/+AnimBundleNode').isEmpty()):
+                CogBodyPool.notify.warning(f'Unable to prewarm {path}')
+            elif path in animPaths:
+                CogBodyPool.anims[path] = model.find('**/+AnimBundleNode')
+            else:
+                CogBodyPool.models[path] = model
+        CogBodyPool.notify.info(f'Prewarmed {len(CogBodyPool.models)} body models and {len(CogBodyPool.anims)} animations')
+
+    @staticmethod
+    def getModel(modelPath: str) -> NodePath | str:
+        """
+        :return: The pooled model for Actor.loadModel to copy, or the path if it isn't pooled (yet)
+        """
+        if modelPath in CogBodyPool.models:
+            return CogBodyPool.models[modelPath]
+        DataPackManager.ensureResource(modelPath)
+        return modelPath
+
+    @staticmethod
+    def getAnim(animPath: str) -> NodePath | str:
+        """
+        :return: The pooled anim bundle, or the path if it isn't pooled (yet)
+        """
+        if animPath in CogBodyPool.anims:
+            return CogBodyPool.anims[animPath]
+        DataPackManager.ensureResource(animPath)
+        return animPath
+
+
 class Cog(Actor):
 
     def __init__(self):
-        super().__init__(COG_MODELS[0], {'neutral': IDLE_ANIMS[0]})
+        super().__init__(CogBodyPool.getModel(COG_MODELS[0]), {'neutral': CogBodyPool.getAnim(IDLE_ANIMS[0])})
 
         self.activeCogFile: str | None = None
+        # Set by the editor once a pack is open, edits of the active cog file are recorded in it
+        self.journal: EditJournal | None = None
 
         self.loop('neutral')
         self.setTransparency(TransparencyAttrib.MDual)
@@ -52,7 +106,15 @@ class Cog(Actor):
 
         self.heads: List[TCogHead] = []
 
-        self.headParts: List[NodePath] = []
+        # Lined up with self.heads, a part is None until it has loaded
+        self.headParts: List[NodePath | None] = []
+        # Lined up with self.heads, identifies the part across edits (its texture slot and loader task)
+        self.headPartIds: List[int] = []
+        # part id -> the loads of a part that is still loading, cancelled if the part is discarded first
+        self.headLoads: Dict[int, LoadGroup] = {}
+        self.nextHeadPartId: int = 0
+        # 'body' and 'head<part id>' -> what the part holds, updated as parts are added and removed
+        self.partStats: Dict[str, NodeStats] = {}
 
         self.name: str = ''
         self.nameS: str = ''
@@ -68,6 +130,7 @@ class Cog(Actor):
         billboardEffect = BillboardEffect.make(Vec3(0, 0, 1), True, True, 3, base.cam, Vec3(0, 0, 0))
         self.nametagContainer.setEffect(billboardEffect)
         self.nametagContainer.setScale(.3)
+        DataPackManager.ensureResource('phase_3/models/props/panel', 'phase_3/fonts/vtRemingtonPortable.ttf')
         self.nametagPanel: NodePath = loader.loadModel('phase_3/models/props/panel')
         self.nametagPanel.reparentTo(self.nametagContainer)
         self.nametagPanel.setColor(VBase4(0.8, 0.8, 0.8, 0.5))
@@ -98,30 +161,32 @@ class Cog(Actor):
 
     def setTorsoTexture(self, path: str):
         self.torsoTex = path
-        texture = DataPackManager.getTexture(path)
-        texture.setMinfilter(Texture.FTLinearMipmapLinear)
+        texture = DataPackManager.acquireTexture(path, self, 'torso')
         self.find('**/torso').setTexture(texture, 1)
+        self.measureBody()
         self.updateCog()
 
     def setArmTexture(self, path: str):
         self.armTex = path
-        texture = DataPackManager.getTexture(path)
-        texture.setMinfilter(Texture.FTLinearMipmapLinear)
+        texture = DataPackManager.acquireTexture(path, self, 'arms')
         self.find('**/arms').setTexture(texture, 1)
+        self.measureBody()
         self.updateCog()
 
     def setLegTexture(self, path: str):
         self.legTex = path
-        texture = DataPackManager.getTexture(path)
-        texture.setMinfilter(Texture.FTLinearMipmapLinear)
+        texture = DataPackManager.acquireTexture(path, self, 'legs')
         self.find('**/legs').setTexture(texture, 1)
+        self.measureBody()
         self.updateCog()
 
     def setBody(self, bType: int):
         self.bodyType = bType
         self.removePart('modelRoot')
-        self.loadModel(SKELECOG_MODELS[bType] if self.isSkeleton else COG_MODELS[bType])
-        self.loadAnims({'neutral': IDLE_ANIMS[bType]})
+        modelPath = SKELECOG_MODELS[bType] if self.isSkeleton else COG_MODELS[bType]
+        # Copies the pooled model when it's been prewarmed
+        self.loadModel(CogBodyPool.getModel(modelPath))
+        self.loadAnims({'neutral': CogBodyPool.getAnim(IDLE_ANIMS[bType])})
 
         self.loop('neutral')
 
@@ -130,24 +195,89 @@ class Cog(Actor):
             self.setArmTexture(self.armTex)
             self.setLegTexture(self.legTex)
             self.find('**/hands').setColor(self.handColor)
-        self.loadHeads()
+        self.reattachHeads()
+        self.measureBody()
 
         self.setColorScale(self.colorScale)
         self.adjustNametag()
         self.updateCog()
 
     def addHead(self, head: TCogHead):
-        self.heads.append(head)
-        self.loadHeads()
+        self.setHeads(self.heads + [head])
 
     def clearHeads(self):
-        self.heads = []
-        for node in self.headParts:
-            node.removeNode()
-            del node
-        self.headParts = []
+        self.setHeads([])
+
+    @staticmethod
+    def snapshotHead(head: TCogHead) -> TCogHead:
+        """
+        Copies the head so later changes to the editor's Vec3s don't show up in it
+        """
+        path, node, texture, pos, hpr, scale, colorScale, removeNodes = head
+        return path, node, texture, tuple(pos), tuple(hpr), tuple(scale), tuple(colorScale), list(removeNodes)
+
+    @staticmethod
+    def getHeadLoadKey(head: TCogHead) -> Tuple:
+        """
+        The parts of a head that need it to be loaded again when they change
+        """
+        path, node, texture, _, _, _, _, removeNodes = head
+        return path, node, texture, tuple(removeNodes)
+
+    def setHeads(self, heads: List[TCogHead]):
+        """
+        Only loads the heads that were added or changed, heads that only moved or
+        changed color are updated in place, and removed heads are thrown away
+        """
+        heads = [self.snapshotHead(head) for head in heads]
+        available: Dict[Tuple, List[int]] = {}
+        for i, head in enumerate(self.heads):
+            available.setdefault(self.getHeadLoadKey(head), []).append(i)
+
+        headParts, headPartIds, toLoad = [], [], []
+        for i, head in enumerate(heads):
+            candidates = available.get(self.getHeadLoadKey(head))
+            if candidates:
+                # Prefer the part that was in the same spot
+                old = i if i in candidates else candidates[0]
+                candidates.remove(old)
+                headPart = self.headParts[old]
+                if headPart is not None:
+                    self.applyHeadTransform(headPart, head)
+                headParts.append(headPart)
+                headPartIds.append(self.headPartIds[old])
+            else:
+                headParts.append(None)
+                headPartIds.append(self.nextHeadPartId)
+                toLoad.append(self.nextHeadPartId)
+                self.nextHeadPartId += 1
+
+        for oldIndices in available.values():
+            for old in oldIndices:
+                self.discardHeadPart(old)
+
+        self.heads, self.headParts, self.headPartIds = heads, headParts, headPartIds
+        for partId in toLoad:
+            self.headLoads[partId] = LoadGroup()
+            taskMgr.add(self.__loadHead(partId))
         self.updateCog()
 
+    def discardHeadPart(self, index: int):
+        partId = self.headPartIds[index]
+        loads = self.headLoads.pop(partId, None)
+        if loads is not None:
+            loads.cancel()
+        if self.headParts[index] is not None:
+            self.headParts[index].removeNode()
+        self.partStats.pop(f'head{partId}', None)
+        DataPackManager.releaseTextures(self, f'head{partId}')
+
+    @staticmethod
+    def applyHeadTransform(headPart: NodePath, head: TCogHead):
+        _, _, _, pos, hpr, scale, colorScale, _ = head
+        headPart.setPosHprScale(*pos, *hpr, *scale)
+        headPart.setColorScale(*colorScale)
+
     def changeColor(self, r: float, g: float, b: float, a: float):
         self.colorScale = VBase4(r, g, b, a)
         self.setColorScale(self.colorScale)
@@ -190,39 +320,82 @@ class Cog(Actor):
         self.setBody(self.bodyType)
         self.updateCog()
 
-    def loadHeads(self):
-        for node in self.headParts:
-            node.removeNode()
-            del node
-        self.headParts = []
-        for head in self.heads:
-            path, node, texture, pos, hpr, scale, colorScale, removeNodes = head
-
-            if node == '':
-                node = None
-
-            _headModel = DataPackManager.getModelNode(path, node)
-            if self.bodyType == 0:
-                headPart = self.instance(_headModel, 'modelRoot', 'to_head')
-            else:
-                headPart = self.instance(_headModel, 'modelRoot', 'joint_head')
-            if texture != '':
-                headTex = DataPackManager.getTexture(texture)
-                headTex.setMinfilter(Texture.FTLinearMipmapLinear)
-                headPart.setTexture(headTex, 1)
+    def getHeadJoint(self) -> NodePath:
+        return self.getPart('modelRoot').find('**/to_head' if self.bodyType == 0 else '**/joint_head')
+
+    def reattachHeads(self):
+        """
+        Moves the loaded head parts over to the current body's head joint
+        """
+        headJoint = self.getHeadJoint()
+        for headPart in self.headParts:
+            if headPart is not None:
+                headPart.reparentTo(headJoint)
+
+    def measureBody(self):
+        """
+        Measures the body without its heads, those are measured as they load
+        """
+        for headPart in self.headParts:
+            if headPart is not None:
+                headPart.detachNode()
+        self.partStats['body'] = measureNode(self.getPart('modelRoot'))
+        self.reattachHeads()
+
+    def getMemoryReport(self) -> List[str]:
+        """
+        :return: A line for the body, each loaded head and the whole cog
+        """
+        lines = [f'Body: {self.partStats["body"]}'] if 'body' in self.partStats else []
+        for (path, node, _, _, _, _, _, _), partId in zip(self.heads, self.headPartIds):
+            stats = self.partStats.get(f'head{partId}')
+            lines.append(f'Head {path}{":" + node if node else ""}: {stats if stats else "loading"}')
+        lines.append(f'Cog total: {combineStats(self.partStats.values())}')
+        return lines
+
+    async def __loadHead(self, partId: int):
+        loads = self.headLoads.get(partId)
+        if loads is None or loads.cancelled:
+            # The head was removed before it started loading, e.g. by another setHeads in the same frame
+            return
+        path, node, texture, _, _, _, _, removeNodes = self.heads[self.headPartIds.index(partId)]
+
+        if node == '':
+            node = None
+
+        # The model and texture load at the same time
+        modelTask = taskMgr.add(loads.run(DataPackManager.getHeadModelAsync(path, node, removeNodes, loads)))
+        textureTask = taskMgr.add(loads.run(DataPackManager.getTextureAsync(texture, loads))) if texture != '' else None
+        _headModel: NodePath | None = await modelTask
+        if textureTask is not None:
+            await textureTask
+        if loads.cancelled:
+            # The head was removed while it was loading
+            if _headModel is not None:
+                _headModel.removeNode()
+            return
+        del self.headLoads[partId]
+        # The head may have moved in the list while it was loading
+        index = self.headPartIds.index(partId)
 
-            for node in removeNodes:
-                _np = headPart.find(f'**/{node}')
-                if not _np.isEmpty():
-                    _np.removeNode()
+        if self.bodyType == 0:
+            headPart = self.instance(_headModel, 'modelRoot', 'to_head')
+        else:
+            headPart = self.instance(_headModel, 'modelRoot', 'joint_head')
+        if texture != '':
+            headTex = DataPackManager.acquireTexture(texture, self, f'head{partId}')
+            headPart.setTexture(headTex, 1)
 
-            headPart.setPosHprScale(*pos, *hpr, *scale)
-            headPart.setColorScale(colorScale)
+        # Transform and color can change while loading, so use what the head has now
+        self.applyHeadTransform(headPart, self.heads[index])
 
-            self.headParts.append(headPart)
+        self.headParts[index] = headPart
+        self.partStats[f'head{partId}'] = measureNode(headPart)
 
-            _headModel.removeNode()
-        self.updateCog()
+        _headModel.removeNode()
+        if not self.headLoads:
+            DataPackManager.notify.debug(f'Model cache: {DataPackManager.modelCache.getStats()}')
+            DataPackManager.notify.debug(f'Texture cache: {DataPackManager.textureCache.getStats()}')
 
     def setQuoteSets(self, sets: List[str] | None = None):
         if sets is None:
@@ -262,8 +435,16 @@ class Cog(Actor):
         return jdict
 
     def updateCog(self):
-        if not self.activeCogFile:
+        """
+        Records what changed in the journal, the cog file is saved once the edits settle down, see EditJournal
+        """
+        if not self.activeCogFile or self.journal is None:
             return
-        DPDKGlobal.DKBase.notify.debug(self.toJson())
-        with open(self.activeCogFile, 'w') as file:
-            file.write(json.dumps(self.toJson(), indent = 4))
+        self.journal.record(self.activeCogFile, self.toJson())
+
+    def flushCog(self):
+        """
+        Saves pending edits right away, call it before switching to another cog file or quitting
+        """
+        if self.journal is not None:
+            self.journal.snapshot()
@@ -0,0 +1,68 @@
+"""
+Memory accounting for what the preview shows, to spot pack content that's too heavy for the game
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple
+
+from panda3d.core import ModelPool, NodePath, SceneGraphAnalyzer, StringStream, Texture, TexturePool
+
+
+class NodeStats:
+    """
+    The geometry and textures under a node, measured once when it's added to the scene
+    """
+
+    def __init__(self, vertices: int = 0, geoms: int = 0, textures: Iterable[Texture] = ()):
+        self.vertices: int = vertices
+        self.geoms: int = geoms
+        # Unique by texture, so shared textures are only counted once when stats are combined
+        self.textures: List[Texture] = list(dict.fromkeys(textures))
+
+    @property
+    def textureBytes(self) -> int:
+        return sum(texture.estimateTextureMemory() for texture in self.textures)
+
+    def __str__(self) -> str:
+        return (f'{self.vertices} vertices, {self.geoms} geoms, {len(self.textures)} textures '
+                f'({formatBytes(self.textureBytes)})')
+
+
+def formatBytes(size: int) -> str:
+    if size < 1 << 20:
+        return f'{size / 1024:.1f} KB'
+    return f'{size / 1048576:.1f} MB'
+
+
+def measureNode(node: NodePath) -> NodeStats:
+    analyzer = SceneGraphAnalyzer()
+    analyzer.addNode(node.node())
+    return NodeStats(analyzer.getNumVertices(), analyzer.getNumGeoms(), node.findAllTextures())
+
+
+def combineStats(stats: Iterable[NodeStats]) -> NodeStats:
+    stats = list(stats)
+    return NodeStats(sum(stat.vertices for stat in stats), sum(stat.geoms for stat in stats),
+                     [texture for stat in stats for texture in stat.textures])
+
+
+def getModelPoolTotals() -> Tuple[int, NodeStats]:
+    """
+    :return: The number of models in the ModelPool, and what they hold
+    """
+    # The pool can only list itself as text, one path per line followed by its reference count
+    stream = StringStream()
+    ModelPool.write(stream)
+    lines = stream.getData().decode('utf-8', 'replace').splitlines()
+    stats = []
+    for line in lines[1:-1]:
+        if line.startswith(' '):
+            continue
+        model = ModelPool.getModel(line, False)
+        if model is not None:
+            stats.append(measureNode(NodePath(model)))
+    return len(stats), combineStats(stats)
+
+
+def getTexturePoolTotals() -> NodeStats:
+    return NodeStats(textures = TexturePool.findAllTextures('*'))
@@ -11,6 +11,7 @@ from wx.lib.agw.knobctrl import KnobCtrl
 
 from src.base import DPDKGlobal
 from src.base.ToontownTypes import TCogHead
+from src.widgets.ResourcePicker import ResourcePicker
 
 
 class HeadItem(wx.Panel):
@@ -36,7 +37,7 @@ class HeadItem(wx.Panel):
         pathEntryLabel = wx.StaticText(
             self, label = 'Model File'
         )
-        self.pathEntry = wx.FilePickerCtrl(
+        self.pathEntry = ResourcePicker(
             self,
             size = self.FromDIP(wx.Size((400, 25))),
             wildcard = "Realms Model Files (*.bam)|*.bam",
@@ -57,7 +58,7 @@ class HeadItem(wx.Panel):
         textureEntryLabel = wx.StaticText(
             self, label = 'Texture Override (Optional)'
         )
-        self.textureEntry = wx.FilePickerCtrl(
+        self.textureEntry = ResourcePicker(
             self,
             size = self.FromDIP(wx.Size((400, 25))),
             wildcard = "Realms Texture Files (*.png)|*.png",
@@ -0,0 +1,137 @@
+# ResourcePicker
+# file picker for game resources, stands in for wx.FilePickerCtrl
+# game resources are browsed by querying the subfile catalog instead of walking the
+# resources directory, which also works when the paks are mounted or lazily extracted
+
+import os
+from os.path import abspath
+from typing import List, Tuple
+
+import wx
+from wx import Window
+
+from src.base import DPDKGlobal
+from src.base.SubfileCatalog import SubfileCatalog
+from src.datapack.DataPackManager import DataPackManager
+
+
+def getWildcardExtensions(wildcard: str) -> Tuple[str, ...]:
+    """
+    'Realms Texture Files (*.png)|*.png' -> ('png',)
+    """
+    patterns = wildcard.split('|')[1::2]
+    extensions = []
+    for pattern in patterns:
+        for filePattern in pattern.split(';'):
+            extension = filePattern.strip().lstrip('*.')
+            if extension and extension != '*':
+                extensions.append(extension)
+    return tuple(extensions)
+
+
+class ResourceBrowserDialog(wx.Dialog):
+
+    def __init__(self, parent: Window, message: str, wildcard: str):
+        super().__init__(parent, title = message, size = parent.FromDIP(wx.Size(500, 600)),
+                         style = wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.wildcard: str = wildcard
+        self.extensions: Tuple[str, ...] = getWildcardExtensions(wildcard)
+        self.path: str = ''
+        self.catalog: SubfileCatalog = DPDKGlobal.DKBase.catalog
+        self.shownFiles: List[str] = self.catalog.query(extensions = self.extensions)
+
+        layout = wx.BoxSizer(wx.VERTICAL)
+
+        filterBar = wx.BoxSizer(wx.HORIZONTAL)
+        self.phaseChoice = wx.Choice(self, choices = ['All phases'] + self.catalog.getPhases())
+        self.phaseChoice.SetSelection(0)
+        self.phaseChoice.Bind(wx.EVT_CHOICE, self.__filter)
+        self.filterEntry = wx.SearchCtrl(self)
+        self.filterEntry.SetDescriptiveText('Search, or use a glob like phase_4/maps/*.png')
+        self.filterEntry.Bind(wx.EVT_TEXT, self.__filter)
+        filterBar.Add(self.phaseChoice)
+        filterBar.Add(self.filterEntry, 1, wx.EXPAND)
+
+        self.fileList = wx.ListBox(self, choices = self.shownFiles, style = wx.LB_SINGLE)
+        self.fileList.Bind(wx.EVT_LISTBOX_DCLICK, self.__choose)
+
+        buttonBar = wx.BoxSizer(wx.HORIZONTAL)
+        diskButton = wx.Button(self, label = 'Browse Disk...')
+        diskButton.Bind(wx.EVT_BUTTON, self.__browseDisk)
+        okButton = wx.Button(self, id = wx.ID_OK, label = 'Select')
+        okButton.Bind(wx.EVT_BUTTON, self.__choose)
+        cancelButton = wx.Button(self, id = wx.ID_CANCEL, label = 'Cancel')
+        buttonBar.AddMany((diskButton, okButton, cancelButton))
+
+        layout.Add(filterBar, 0, wx.EXPAND)
+        layout.Add(self.fileList, 1, wx.EXPAND)
+        layout.Add(buttonBar)
+        self.SetSizer(layout)
+
+    def __filter(self, _):
+        search = self.filterEntry.GetValue()
+        phases = (self.phaseChoice.GetStringSelection(),) if self.phaseChoice.GetSelection() > 0 else ()
+        if any(char in search for char in '*?['):
+            self.shownFiles = self.catalog.query(pattern = search, extensions = self.extensions, phases = phases)
+        else:
+            self.shownFiles = self.catalog.query(contains = search, extensions = self.extensions, phases = phases)
+        self.fileList.Set(self.shownFiles)
+
+    def __choose(self, _):
+        selection = self.fileList.GetSelection()
+        if selection == wx.NOT_FOUND:
+            return
+        DataPackManager.ensureResource(self.shownFiles[selection])
+        self.path = os.path.join(abspath(DPDKGlobal.DKBase.gameResourcesPath), self.shownFiles[selection])
+        self.EndModal(wx.ID_OK)
+
+    def __browseDisk(self, _):
+        with wx.FileDialog(self, wildcard = self.wildcard, style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() == wx.ID_OK:
+                self.path = dialog.GetPath()
+                self.EndModal(wx.ID_OK)
+
+    def GetPath(self) -> str:
+        return self.path
+
+
+class ResourcePicker(wx.Panel):
+
+    def __init__(self, parent: Window, id: int = wx.ID_ANY, path: str = '', message: str = 'Select a file',
+                 wildcard: str = '*.*', size: wx.Size = wx.DefaultSize, name: str = 'resourcepicker'):
+        super().__init__(parent, id, wx.DefaultPosition, size, name = name)
+
+        self.message: str = message
+        self.wildcard: str = wildcard
+        self.initialDirectory: str = ''
+
+        layout = wx.BoxSizer(wx.HORIZONTAL)
+        self.pathEntry = wx.TextCtrl(self, value = path, style = wx.TE_READONLY)
+        browseButton = wx.Button(self, label = 'Browse', style = wx.BU_EXACTFIT)
+        browseButton.Bind(wx.EVT_BUTTON, self.browse)
+        layout.Add(self.pathEntry, 1, wx.EXPAND)
+        layout.Add(browseButton, 0, wx.EXPAND)
+        self.SetSizer(layout)
+
+    def browse(self, _ = None):
+        if DPDKGlobal.DKBase.catalog is None:
+            # Dev resources aren't cataloged, they're plain files anyway
+            dialog = wx.FileDialog(self, message = self.message, defaultDir = self.initialDirectory,
+                                   wildcard = self.wildcard, style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+        else:
+            dialog = ResourceBrowserDialog(self, self.message, self.wildcard)
+
+        with dialog:
+            if dialog.ShowModal() == wx.ID_OK and dialog.GetPath():
+                self.SetPath(dialog.GetPath())
+                event = wx.FileDirPickerEvent(wx.wxEVT_FILEPICKER_CHANGED, self, self.GetId(), dialog.GetPath())
+                self.GetEventHandler().ProcessEvent(event)
+
+    def GetPath(self) -> str:
+        return self.pathEntry.GetValue()
+
+    def SetPath(self, path: str):
+        self.pathEntry.ChangeValue(path)
+
+    def SetInitialDirectory(self, directory: str):
+        self.initialDirectory = directory
@@ -0,0 +1,156 @@
+# VirtualList
+# list that only draws the rows that are visible, from rows kept in memory, so it stays quick with thousands of entries
+# click a column header to sort by it, and type in the search box to only show the rows containing the text
+# rows are opened with the Open button, the right click menu, or by double clicking them
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import wx
+from wx import Window
+
+TRow = Tuple[str, ...]
+
+
+class VirtualList(wx.Panel):
+
+    def __init__(self, parent: Window, columns: List[Tuple[str, int]], onOpen: Callable[[str], None],
+                 size: wx.Size = wx.DefaultSize, id: int = wx.ID_ANY, name: str = "virtuallist"):
+        """
+        :param columns: (title, width) of each column
+        :param onOpen: Called with a row's key when it's opened (Open button, right click menu, double click or enter)
+        """
+        super().__init__(parent, id, wx.DefaultPosition, size, name = name)
+
+        self.layout = wx.BoxSizer(wx.VERTICAL)
+        self.onOpen: Callable[[str], None] = onOpen
+
+        # key -> row, and the keys that pass the filter in the order they're shown
+        self.rows: Dict[str, TRow] = {}
+        self.view: List[str] = []
+        self.filterText: str = ''
+        self.sortColumn: int = 0
+        self.sortAscending: bool = True
+
+        self.searchBox = wx.SearchCtrl(self)
+        self.searchBox.ShowCancelButton(True)
+        self.searchBox.Bind(wx.EVT_TEXT, self.__search)
+        self.searchBox.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.__clearSearch)
+
+        self.openButton = wx.Button(self, label = 'Open')
+        self.openButton.Bind(wx.EVT_BUTTON, self.__openSelected)
+        self.openButton.Disable()
+
+        self.listCtrl = VirtualListCtrl(self)
+        for i, (title, width) in enumerate(columns):
+            self.listCtrl.InsertColumn(i, title, width = self.FromDIP(width))
+        self.listCtrl.Bind(wx.EVT_LIST_COL_CLICK, self.__sort)
+        self.listCtrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.__open)
+        self.listCtrl.Bind(wx.EVT_LIST_ITEM_SELECTED, self.__updateOpenButton)
+        self.listCtrl.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.__updateOpenButton)
+        self.listCtrl.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self.__showMenu)
+
+        toolbar = wx.BoxSizer(wx.HORIZONTAL)
+        toolbar.Add(self.searchBox, 1, wx.EXPAND)
+        toolbar.Add(self.openButton, 0, wx.LEFT, self.FromDIP(4))
+        self.layout.Add(toolbar, 0, wx.EXPAND)
+        self.layout.Add(self.listCtrl, 1, wx.EXPAND)
+        self.SetSizer(self.layout)
+
+    def getRow(self, index: int) -> TRow:
+        return self.rows[self.view[index]]
+
+    def setRows(self, rows: Dict[str, TRow]):
+        """
+        Replaces every row
+        """
+        self.rows = dict(rows)
+        self.updateView()
+
+    def updateRows(self, changed: Dict[str, TRow], removed: List[str] = ()):
+        """
+        Adds or replaces the changed rows and removes the removed ones, leaving the rest alone
+        """
+        for key in removed:
+            self.rows.pop(key, None)
+        self.rows.update(changed)
+        self.updateView()
+
+    def setFilter(self, text: str):
+        self.filterText = text.lower()
+        self.updateView()
+
+    def sortBy(self, column: int, ascending: bool = True):
+        self.sortColumn, self.sortAscending = column, ascending
+        self.listCtrl.ShowSortIndicator(column, ascending)
+        self.updateView()
+
+    def getSelectedKey(self) -> Optional[str]:
+        index = self.listCtrl.GetFirstSelected()
+        return self.view[index] if index != -1 else None
+
+    def updateView(self):
+        selectedIndex = self.listCtrl.GetFirstSelected()
+        selected = self.view[selectedIndex] if selectedIndex != -1 else None
+        if selectedIndex != -1:
+            self.listCtrl.Select(selectedIndex, False)
+        if self.filterText:
+            keys = [key for key, row in self.rows.items() if any(self.filterText in text.lower() for text in row)]
+        else:
+            keys = list(self.rows)
+        keys.sort(key = lambda key: (self.rows[key][self.sortColumn].lower(), key), reverse = not self.sortAscending)
+        self.view = keys
+
+        self.listCtrl.SetItemCount(len(self.view))
+        # Keep the selection on the same row wherever it moved to
+        if selected in self.rows and selected in self.view:
+            index = self.view.index(selected)
+            self.listCtrl.Select(index)
+            self.listCtrl.EnsureVisible(index)
+        self.listCtrl.Refresh()
+        self.__updateOpenButton()
+
+    def __search(self, _):
+        self.setFilter(self.searchBox.GetValue())
+
+    def __clearSearch(self, _):
+        self.searchBox.SetValue('')
+
+    def __sort(self, e: wx.ListEvent):
+        column = e.GetColumn()
+        # Clicking the sorted column again flips the order
+        self.sortBy(column, not self.sortAscending if column == self.sortColumn else True)
+
+    def __open(self, e: wx.ListEvent):
+        self.onOpen(self.view[e.GetIndex()])
+
+    def __openSelected(self, _ = None):
+        key = self.getSelectedKey()
+        if key is not None:
+            self.onOpen(key)
+
+    def __updateOpenButton(self, e: Optional[wx.ListEvent] = None):
+        self.openButton.Enable(self.getSelectedKey() is not None)
+        if e is not None:
+            e.Skip()
+
+    def __showMenu(self, e: wx.ListEvent):
+        # Right clicking a row selects it, so the menu opens that row
+        self.listCtrl.Select(e.GetIndex())
+        menu = wx.Menu()
+        openItem = menu.Append(wx.ID_OPEN, 'Open')
+        menu.Bind(wx.EVT_MENU, self.__openSelected, openItem)
+        self.PopupMenu(menu)
+        menu.Destroy()
+
+
+class VirtualListCtrl(wx.ListCtrl):
+    """
+    Asks its VirtualList for the text of the rows it draws
+    """
+
+    def __init__(self, virtualList: VirtualList):
+        super().__init__(virtualList, style = wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.virtualList: VirtualList = virtualList
+
+    def OnGetItemText(self, item: int, column: int) -> str:
+        return self.virtualList.getRow(item)[column]
@@ -1,7 +1,5 @@
 import subprocess
 
-import shutil
-
 import glob
 import json
 import os
@@ -26,12 +24,19 @@ from wx.lib.scrolledpanel import ScrolledPanel
 from .WxAppShell import *
 from .ViewPort import *
 from src.base import DPDKGlobal
+from src.base.ResourceExtractor import findClientPaks
+from ..datapack.DataPackGlobals import ResourceMode
 from ..datapack.DataPackManager import DataPackManager
-from ..ott.OTTUtil import toAlphaNumeric
+from ..datapack.EditJournal import EditJournal
+from ..datapack.PackModel import PackModel, WatchedFolder, summarizePack
+from ..datapack.PackPrefetcher import PackPrefetcher
+from ..datapack.PackValidator import PackValidator
+from ..ott.OTTUtil import runInThread, toAlphaNumeric
 from ..pandaview.Cog import Cog
-from ..widgets.CogOverrideItem import CogOverrideItem
-from ..widgets.PackItem import PackItem
+from ..pandaview.MemoryStats import getModelPoolTotals, getTexturePoolTotals
 from ..widgets.HeadItem import HeadItem
+from ..widgets.ResourcePicker import ResourcePicker
+from ..widgets.VirtualList import VirtualList, TRow
 
 
 class WxPandaShell(WxAppShell):
@@ -44,9 +49,18 @@ class WxPandaShell(WxAppShell):
                  '\nAll Rights Reserved.')
 
     def __init__(self):
-        self.packListItems: List[PackItem] = []
+        # Every pack's pack.json, see setupHomePage
+        self.packsFolder = WatchedFolder('sdk/packs', '*/pack.json', summarizePack)
         self.headItems: List[HeadItem] = []
-        self.cogOverrideItems: List[CogOverrideItem] = []
+        # The open pack's files, see loadPack
+        self.packModel: PackModel | None = None
+        # Created once the game resources are ready, see createCogPreview
+        self.cogPreview: Cog | None = None
+        self.packPrefetcher = PackPrefetcher()
+        # Edit history of the open pack, see loadPack
+        self.journal: EditJournal | None = None
+        # Created the first time a pack is validated, see getPackValidator
+        self.packValidator: PackValidator | None = None
 
         WxAppShell.__init__(self)
 
@@ -54,10 +68,11 @@ class WxPandaShell(WxAppShell):
 
         self.initialize()
 
+    def showNotice(self):
         wx.MessageBox(
             """Welcome to the Toontown Realms Data Pack Development Kit!
         
-This is ALPHA software. Be sure to make regular backups of your Data Pack files. Most changes are applied automatically with no way to revert.""",
+This is ALPHA software. Be sure to make regular backups of your Data Pack files. Most changes are applied automatically, use Edit > Undo to revert them.""",
             caption = "Notice")
 
     def createInterface(self):
@@ -70,8 +85,25 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         self.compileButton: wx.MenuItem = wx.MenuItem(self.shareMenu, wx.ID_SAVE, text = 'Compile Pack', kind = wx.ITEM_NORMAL)
         self.shareMenu.Append(self.compileButton)
 
-        self.Bind(wx.EVT_MENU, self.buildPack, self.compileButton)
+        self.validateButton: wx.MenuItem = self.shareMenu.Append(wx.ID_ANY, 'Validate Pack')
+
+        self.Bind(wx.EVT_MENU, self.compilePack, self.compileButton)
+        self.Bind(wx.EVT_MENU, self.validatePack, self.validateButton)
         self.compileButton.Enable(0)
+        self.validateButton.Enable(0)
+
+        self.editMenu = wx.Menu()
+        self.menuBar.Insert(1, self.editMenu, "&Edit")
+        self.undoButton: wx.MenuItem = self.editMenu.Append(wx.ID_UNDO, '&Undo\tCtrl+Z')
+        self.redoButton: wx.MenuItem = self.editMenu.Append(wx.ID_REDO, '&Redo\tCtrl+Y')
+        self.Bind(wx.EVT_MENU, self.undoEdit, self.undoButton)
+        self.Bind(wx.EVT_MENU, self.redoEdit, self.redoButton)
+        self.Bind(wx.EVT_MENU_OPEN, self.__updateEditMenu)
+
+        self.toolsMenu = wx.Menu()
+        self.menuBar.Insert(3, self.toolsMenu, "&Tools")
+        memoryItem = self.toolsMenu.Append(wx.ID_ANY, 'Memory Usage')
+        self.Bind(wx.EVT_MENU, self.showMemoryReport, memoryItem)
 
         self.setupHomePage()
 
@@ -79,12 +111,92 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
 
         self.setupSettingsPage()
 
+        self.setupStatusBar()
+
         # add the pages
 
         self.Layout()
         self.tabFrame.AddPage(self.homeFrame, "Home")
         self.tabFrame.AddPage(self.settingsPage, "Settings")
 
+    def getPackValidator(self) -> PackValidator:
+        if self.packValidator is None:
+            dkBase = DPDKGlobal.DKBase
+            # The workers have to mount the paks themselves when they aren't extracted
+            paks = []
+            if dkBase.resourceMode in (ResourceMode.MOUNT, ResourceMode.LAZY):
+                paks = findClientPaks(dkBase.settings.get('realms_client_directory'))
+            self.packValidator = PackValidator(dkBase.gameResourcesPath, paks,
+                                               workers = dkBase.settings.get('validation_workers', None))
+        return self.packValidator
+
+    def validatePack(self, _ = None):
+        taskMgr.add(self.__validatePack(compileAfter = False), 'validatePack')
+
+    def compilePack(self, _ = None):
+        taskMgr.add(self.__validatePack(compileAfter = True), 'validatePack')
+
+    async def __validatePack(self, compileAfter: bool):
+        self.compileButton.Enable(0)
+        self.validateButton.Enable(0)
+        self.setStatus(f'Validating {DPDKGlobal.DKBase.activePack}...', 0, 0)
+
+        packFolder = f'sdk/packs/{DPDKGlobal.DKBase.activePack}'
+        # The game's appearances are read here, the lazy extractor isn't thread safe
+        appearances = {path: DataPackManager.readResourceFile(path) for path in
+                       DataPackManager.listResourceFiles('phase_3/data/cogs/appearance', ('json',), recursive = False)}
+        appearances.update(PackValidator.readPackAppearances(packFolder))
+        broken = await runInThread(self.getPackValidator().validate, appearances, packFolder)
+
+        self.compileButton.Enable(1)
+        self.validateButton.Enable(1)
+        if broken is None:
+            self.setStatus('Unable to validate the pack, see the log')
+            return
+        self.setStatus(f'Validated {len(appearances)} appearances, {len(broken)} broken references')
+        for reference in broken:
+            wx.LogMessage(str(reference))
+
+        if not broken:
+            if compileAfter:
+                self.buildPack()
+            else:
+                wx.MessageBox('No broken references found.', caption = 'Validate Pack')
+            return
+        # Long reports are in the log
+        report = '\n'.join(str(reference) for reference in broken[:20])
+        if len(broken) > 20:
+            report += f'\n...and {len(broken) - 20} more'
+        if compileAfter:
+            if wx.MessageBox(f'{report}\n\nCompile anyway?', caption = f'{len(broken)} Broken References',
+                             style = wx.YES_NO | wx.ICON_WARNING) == wx.YES:
+                self.buildPack()
+        else:
+            wx.MessageBox(report, caption = f'{len(broken)} Broken References', style = wx.OK | wx.ICON_WARNING)
+
+    def __updateEditMenu(self, e: wx.MenuEvent):
+        self.undoButton.Enable(self.journal is not None and self.journal.canUndo())
+        self.redoButton.Enable(self.journal is not None and self.journal.canRedo())
+        e.Skip()
+
+    def undoEdit(self, _ = None):
+        if self.journal is not None:
+            self.reloadEditedFiles(self.journal.undo())
+
+    def redoEdit(self, _ = None):
+        if self.journal is not None:
+            self.reloadEditedFiles(self.journal.redo())
+
+    def reloadEditedFiles(self, paths: List[str]):
+        """
+        Shows an undone or redone edit if it's in the open cog
+
+        :param paths: Edited files, relative to the pack folder
+        """
+        activeCogFile = self.cogPreview.activeCogFile
+        if activeCogFile is not None and self.journal.getRelativePath(activeCogFile) in paths:
+            self.loadCogFile(activeCogFile)
+
     def buildPack(self, _ = None):
         if not os.path.exists('sdk/built'):
             os.makedirs('sdk/built')
@@ -105,6 +217,19 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         folder = abspath(f'sdk/built/{DPDKGlobal.DKBase.activePack}.rmdp')
         subprocess.run(f'explorer /select, "{folder}"')
 
+    def showMemoryReport(self, _ = None):
+        lines = []
+        if self.cogPreview is not None:
+            lines += self.cogPreview.getMemoryReport()
+        modelCount, modelStats = getModelPoolTotals()
+        lines.append(f'ModelPool: {modelCount} models, {modelStats}')
+        lines.append(f'TexturePool: {getTexturePoolTotals()}')
+        lines.append(f'Model cache: {DataPackManager.modelCache.getStats()}')
+        lines.append(f'Texture cache: {DataPackManager.textureCache.getStats()}')
+        for line in lines:
+            wx.LogMessage(line)
+        wx.MessageBox('\n'.join(lines), caption = 'Memory Usage')
+
     def setupHomePage(self):
         # === Home Page ===
         self.homeFrame = wx.Panel(self.tabFrame)
@@ -115,43 +240,35 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         availPacksLabel.SetFont(self.uiFontLarge)
         layout.Add(availPacksLabel)
 
-        self.availPacksList = ScrolledPanel(self.homeFrame, size = self.FromDIP(wx.Size(500, 500)))
-
-        self.availPackLayout = wx.BoxSizer(wx.VERTICAL)
-
-        self.availPacksList.SetSizer(self.availPackLayout)
-        self.availPacksList.SetupScrolling()
-
-        layout.Add(self.availPacksList)
+        self.packList = VirtualList(self.homeFrame, [('Name', 220), ('Author', 140), ('Folder', 120)],
+                                    self.openPackEntry, size = self.FromDIP(wx.Size(500, 500)))
+        layout.Add(self.packList)
 
         newPackButton = wx.Button(self.homeFrame, label = 'New Pack')
         newPackButton.Bind(wx.EVT_BUTTON, self.newPack)
         layout.Add(newPackButton)
+        self.packsFolder.addListener(self.onPacksChanged)
         self.updatePackList()
+        self.packsFolder.startWatching()
 
     def updatePackList(self):
-        for pack in self.packListItems:
-            pack.delete()
-        self.packListItems = []
-
-        if not os.path.exists('sdk/packs'):
-            os.mkdir('sdk/packs')
-
-        for folder in os.listdir('sdk/packs'):
-            if os.path.exists(f'sdk/packs/{folder}/pack.json'):
-                self.packListItems.append(PackItem(
-                    packFolder = folder,
-                    parent = self.availPacksList,
-                    sdkInterface = self
-                ))
-
-        self.refreshPackList()
-
-    def refreshPackList(self):
-        self.availPackLayout.Clear()
-        for pack in self.packListItems:
-            self.availPackLayout.Add(pack)
-        self.availPacksList.SetupScrolling()
+        # Only the pack.json files that changed are parsed again
+        self.packsFolder.refresh()
+
+    def onPacksChanged(self, added: List[str], changed: List[str], removed: List[str]):
+        rows: Dict[str, TRow] = {}
+        for key in added + changed:
+            summary = self.packsFolder.entries[key].summary
+            if summary is None:
+                removed.append(key)
+                continue
+            packFolder = key.split('/')[0]
+            rows[key] = (str(summary['name']), str(summary['author']), f'/{packFolder}')
+        self.packList.updateRows(rows, removed)
+
+    def openPackEntry(self, key: str):
+        # Entries are keyed by the path of their pack.json
+        self.openPack(key.split('/')[0])
 
     def newPack(self, _ = None):
         dialog: wx.Dialog
@@ -199,16 +316,60 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
                     json.dump(packinfo, info, indent = 4)
                 self.openPack(_packfn)
 
+    def setupStatusBar(self):
+        self.statusBar: wx.StatusBar = self.CreateStatusBar(2)
+        self.statusBar.SetStatusWidths([-1, self.FromDIP(200)])
+        self.statusGauge = wx.Gauge(self.statusBar, range = 100)
+        self.statusGauge.Hide()
+        self.statusBar.Bind(wx.EVT_SIZE, self.__placeStatusGauge)
+        self.__placeStatusGauge(None)
+
+    def __placeStatusGauge(self, e: wx.SizeEvent | None):
+        rect = self.statusBar.GetFieldRect(1)
+        self.statusGauge.SetPosition(rect.GetPosition())
+        self.statusGauge.SetSize(rect.GetSize())
+        if e is not None:
+            e.Skip()
+
+    def setStatus(self, text: str, done: int | None = None, total: int | None = None):
+        """
+        :param text: Status message
+        :param done: Progress made so far, the gauge is hidden when this is None
+        :param total: Amount of progress to make, the gauge pulses when this is 0
+        """
+        self.statusBar.SetStatusText(text, 0)
+        if done is None:
+            self.statusGauge.Hide()
+            return
+        if total:
+            self.statusGauge.SetRange(total)
+            self.statusGauge.SetValue(done)
+        else:
+            self.statusGauge.Pulse()
+        self.statusGauge.Show()
+
     def openPack(self, packPath: str):
         DPDKGlobal.DKBase.activePack = packPath
+        if not DPDKGlobal.DKBase.resourcesReady:
+            # The pack is opened by DPDKBase once the game resources are ready
+            self.setStatus(f'{packPath} will open once the game resources are loaded...')
+            return
         self.loadPack(None)
 
     def loadPack(self, _):
         self.compileButton.Enable(1)
+        self.validateButton.Enable(1)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = EditJournal(f'sdk/packs/{DPDKGlobal.DKBase.activePack}',
+                                   f'sdk/journal/{DPDKGlobal.DKBase.activePack}.jsonl')
+        self.cogPreview.journal = self.journal
+        # Warms up the caches with what the pack's cogs use, so opening them is quick
+        self.packPrefetcher.start(DPDKGlobal.DKBase.activePack)
         for i in range(self.tabFrame.GetPageCount()):
             self.tabFrame.RemovePage(0)
         self.tabFrame.AddPage(self.cogEditorFrame, "Cog Appearances")
-        self.updateOverrides()
+        self.openPackModel()
 
         self.tabFrame.AddPage(self.settingsPage, "Settings")
 
@@ -224,13 +385,6 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         self.cogEditorRight = wx.Notebook(self.cogEditorFrame)
         self.cogEditorFrame.SplitVertically(self.viewport, self.cogEditorRight, 500)
 
-        self.cogPreview = Cog()
-        self.cogPreview.reparentTo(render)
-        self.cogPreview.setZ(0)
-        self.cogPreview.setH(180)
-
-        self.cogPreview.hide()
-
         # == BODY TYPE ==
         self.cogEditorTabBody = wx.Panel(self.cogEditorRight)
         self.bodyLayout = wx.BoxSizer(wx.VERTICAL)
@@ -251,9 +405,9 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
 
         torsoTexLabel = wx.StaticText(self.cogEditorTabBody, label = "Torso Texture")
         torsoTexLabel.SetFont(self.uiFontNormal)
-        self.torsoTex = wx.FilePickerCtrl(self.cogEditorTabBody,
+        self.torsoTex = ResourcePicker(self.cogEditorTabBody,
                                           size = self.FromDIP(wx.Size((400, 25))),
-                                          path = self.cogPreview.torsoTex,
+                                          path = '',
                                           wildcard = "Realms Texture Files (*.png)|*.png",
                                           message = "Select a Torso Texture")
         self.torsoTex.SetInitialDirectory(abspath(DPDKGlobal.DKBase.gameResourcesPath))
@@ -261,9 +415,9 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
 
         armTexLabel = wx.StaticText(self.cogEditorTabBody, label = "Arm Texture")
         armTexLabel.SetFont(self.uiFontNormal)
-        self.armTex = wx.FilePickerCtrl(self.cogEditorTabBody,
+        self.armTex = ResourcePicker(self.cogEditorTabBody,
                                         size = self.FromDIP(wx.Size((400, 25))),
-                                        path = self.cogPreview.armTex,
+                                        path = '',
                                         wildcard = "Realms Texture Files (*.png)|*.png",
                                         message = "Select an Arm Texture")
         self.armTex.SetInitialDirectory(abspath(DPDKGlobal.DKBase.gameResourcesPath))
@@ -271,9 +425,9 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
 
         legTexLabel = wx.StaticText(self.cogEditorTabBody, label = "Leg Texture")
         legTexLabel.SetFont(self.uiFontNormal)
-        self.legTex = wx.FilePickerCtrl(self.cogEditorTabBody,
+        self.legTex = ResourcePicker(self.cogEditorTabBody,
                                         size = self.FromDIP(wx.Size((400, 25))),
-                                        path = self.cogPreview.legTex,
+                                        path = '',
                                         wildcard = "Realms Texture Files (*.png)|*.png",
                                         message = "Select a Leg Texture")
         self.legTex.SetInitialDirectory(abspath(DPDKGlobal.DKBase.gameResourcesPath))
@@ -354,15 +508,15 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         self.cogEditorTabInfo = wx.Panel(self.cogEditorRight)
         infoLayout = wx.BoxSizer(wx.VERTICAL)
 
-        self.nameLabel = wx.StaticText(self.cogEditorTabInfo, label = f'Name: "{DataPackManager.getLocalizedText(self.cogPreview.name)}"')
+        self.nameLabel = wx.StaticText(self.cogEditorTabInfo, label = 'Name: ""')
         self.nameInput = wx.TextCtrl(self.cogEditorTabInfo, size = self.FromDIP(wx.Size(400, 25)))
         self.nameInput.Bind(wx.EVT_TEXT, self.__updateNames)
 
-        self.nameSLabel = wx.StaticText(self.cogEditorTabInfo, label = f'Name (Singular Form): "{DataPackManager.getLocalizedText(self.cogPreview.nameS)}"')
+        self.nameSLabel = wx.StaticText(self.cogEditorTabInfo, label = 'Name (Singular Form): ""')
         self.nameSInput = wx.TextCtrl(self.cogEditorTabInfo, size = self.FromDIP(wx.Size(400, 25)))
         self.nameSInput.Bind(wx.EVT_TEXT, self.__updateNames)
 
-        self.namePLabel = wx.StaticText(self.cogEditorTabInfo, label = f'Name (Plural Form): "{DataPackManager.getLocalizedText(self.cogPreview.nameP)}"')
+        self.namePLabel = wx.StaticText(self.cogEditorTabInfo, label = 'Name (Plural Form): ""')
         self.namePInput = wx.TextCtrl(self.cogEditorTabInfo, size = self.FromDIP(wx.Size(400, 25)))
         self.namePInput.Bind(wx.EVT_TEXT, self.__updateNames)
 
@@ -393,13 +547,8 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         tempLoad.Bind(wx.EVT_BUTTON, self.chooseNewOverride)
         listLayout.Add(tempLoad)
 
-        self.cogOverridesList = ScrolledPanel(self.cogEditorTabList, size = self.FromDIP(wx.Size(300, 500)))
-
-        self.cogOverridesLayout = wx.BoxSizer(wx.VERTICAL)
-
-        self.cogOverridesList.SetSizer(self.cogOverridesLayout)
-        self.cogOverridesList.SetupScrolling()
-
+        self.cogOverridesList = VirtualList(self.cogEditorTabList, [('Name', 170), ('File', 120)],
+                                            self.openOverrideEntry, size = self.FromDIP(wx.Size(300, 500)))
         listLayout.Add(self.cogOverridesList)
 
         self.cogEditorTabBody.Hide()
@@ -412,34 +561,60 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
 
         # self.loadCog()
 
-    def updateOverrides(self):
-        for cog in self.cogOverrideItems:
-            cog.Destroy()
-        self.cogOverrideItems = []
-
-        self.cogOverridesLayout.Clear()
-
-        if not os.path.exists(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/'):
-            os.mkdir(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/')
-
-        if not os.path.exists(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/'):
-            os.mkdir(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/')
+    def createCogPreview(self):
+        # Needs the game resources, so it's created by DPDKBase once they're ready
+        self.cogPreview = Cog()
+        self.cogPreview.reparentTo(render)
+        self.cogPreview.setZ(0)
+        self.cogPreview.setH(180)
 
-        for file in os.listdir(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/'):
-            if os.path.exists(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/{file}'):
-                self.cogOverrideItems.append(CogOverrideItem(
-                    overrideName = file,
-                    parent = self.cogOverridesList,
-                    sdkInterface = self
-                ))
+        self.cogPreview.hide()
 
-        self.refreshOverrides()
+        self.torsoTex.SetPath(self.cogPreview.torsoTex)
+        self.armTex.SetPath(self.cogPreview.armTex)
+        self.legTex.SetPath(self.cogPreview.legTex)
+        self.updateNameLabels()
+
+    def refreshLocalizedText(self):
+        # Called by DPDKBase once the localizer strings are loaded
+        if self.cogPreview is None:
+            return
+        self.cogPreview.adjustNametag()
+        self.updateNameLabels()
+        if self.packModel is not None:
+            # The names shown are localized
+            self.cogOverridesList.setRows({entry.key: self.getOverrideRow(entry.key, entry.summary)
+                                           for entry in self.packModel.appearances.getEntries() if entry.summary is not None})
 
-    def refreshOverrides(self):
-        self.cogOverridesLayout.Clear()
-        for cog in self.cogOverrideItems:
-            self.cogOverridesLayout.Add(cog)
-        self.cogOverridesList.SetupScrolling()
+    def updateOverrides(self):
+        # Only the appearance files that changed are parsed again
+        if self.packModel is not None:
+            self.packModel.appearances.refresh()
+
+    def openPackModel(self):
+        if self.packModel is not None:
+            self.packModel.close()
+        self.cogOverridesList.setRows({})
+        self.packModel = PackModel(DPDKGlobal.DKBase.activePack)
+        self.packModel.appearances.addListener(self.onAppearancesChanged)
+        self.packModel.open()
+
+    @staticmethod
+    def getOverrideRow(overrideName: str, summary: Dict) -> TRow:
+        return str(DataPackManager.getLocalizedText(summary.get('name'))), overrideName
+
+    def onAppearancesChanged(self, added: List[str], changed: List[str], removed: List[str]):
+        rows: Dict[str, TRow] = {}
+        for overrideName in added + changed:
+            summary = self.packModel.appearances.entries[overrideName].summary
+            if summary is None:
+                removed.append(overrideName)
+                continue
+            rows[overrideName] = self.getOverrideRow(overrideName, summary)
+        self.cogOverridesList.updateRows(rows, removed)
+
+    def openOverrideEntry(self, overrideName: str):
+        self.loadCogFile(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/{overrideName}')
 
     def __rotatePreview(self, e: CommandEvent):
         self.cogPreview.setH(180 + e.GetInt())
@@ -467,9 +642,8 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
             self.__setBodyColor(r, g, b, a)
 
     def updateHeads(self, _):
-        self.cogPreview.clearHeads()
-        for headItem in self.headItems:
-            self.cogPreview.addHead(headItem.get())
+        # Only the heads that changed get loaded again
+        self.cogPreview.setHeads([headItem.get() for headItem in self.headItems])
 
     def refreshHeadList(self):
         self.headLayout.Clear()
@@ -551,6 +725,7 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         self.cogEditorRight.AddPage(self.cogEditorTabInfo, "Info")
 
     def unloadCog(self, _ = None):
+        self.cogPreview.flushCog()
         self.cogPreview.hide()
         self.cogPreview.activeCogFile = None
         self.cogEditorRight.RemovePage(0)
@@ -563,7 +738,9 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
         self.cogPreview.setName(self.nameInput.GetValue())
         self.cogPreview.setNameSingular(self.nameSInput.GetValue())
         self.cogPreview.setNamePlural(self.namePInput.GetValue())
+        self.updateNameLabels()
 
+    def updateNameLabels(self):
         self.nameLabel.SetLabel(f'Name: "{DataPackManager.getLocalizedText(self.cogPreview.name)}"')
         self.nameSLabel.SetLabel(f'Name (Singular Form): "{DataPackManager.getLocalizedText(self.cogPreview.nameS)}"')
         self.namePLabel.SetLabel(f'Name (Plural Form): "{DataPackManager.getLocalizedText(self.cogPreview.nameP)}"')
@@ -571,70 +748,81 @@ This is ALPHA software. Be sure to make regular backups of your Data Pack files.
     def chooseNewOverride(self, _):
         cogs = []
         filePaths = []
-        for defaultCog in glob.glob(os.path.join(DPDKGlobal.DKBase.gameResourcesPath, 'phase_3/data/cogs/appearance/*.json')):
-            with open(defaultCog, 'r') as cog:
-                js = json.load(cog)
-                name = DataPackManager.getLocalizedText(js.get('name', 'improperly formatted appearance file!'))
-                cogs.append(f'{os.path.basename(defaultCog)} | {name}')
-                filePaths.append(abspath(defaultCog))
+        for defaultCog in DataPackManager.listResourceFiles('phase_3/data/cogs/appearance', ('json',), recursive = False):
+            js = json.loads(DataPackManager.readResourceFile(defaultCog))
+            name = DataPackManager.getLocalizedText(js.get('name', 'improperly formatted appearance file!'))
+            cogs.append(f'{os.path.basename(defaultCog)} | {name}')
+            filePaths.append(defaultCog)
         dialog: wx.SingleChoiceDialog
         with wx.SingleChoiceDialog(parent = self, caption = 'Choose a Cog', choices = cogs, message = 'Choose a default Cog to override') as dialog:
             if dialog.ShowModal() == wx.ID_OK:
                 path = filePaths[dialog.GetSelection()]
                 filename = os.path.basename(path)
-                shutil.copy(path, f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/{filename}')
+                # Read through the VFS rather than copying, the paks may be mounted instead of extracted
+                with open(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/{filename}', 'w') as file:
+                    file.write(DataPackManager.readResourceFile(path))
                 self.loadCogFile(f'sdk/packs/{DPDKGlobal.DKBase.activePack}/cogs/appearance/{filename}')
 
     def loadCogFile(self, filePath: str):
+        # Undo and redo load the open cog again
+        reloading = self.cogPreview.activeCogFile is not None
+        self.cogPreview.flushCog()
         self.cogPreview.activeCogFile = None
         self.cogPreview.clearHeads()
         self.headLayout.Clear()
         for head in self.headItems:
             head.Destroy()
         self.headItems = []
-        with open(filePath, 'r') as cog:
-            js = json.load(cog)
-            for head in js['head_models']:
-                self.addHead(head)
-
-            self.cogPreview.setSkeleton(js.get('is_skeleton', False))
-
-            self.bodyTypeSelection.Select(js.get('body_type', 0))
-            self.setBody(None)
-            self.bodyScale.SetValue(js.get('scale', 1))
-            self.setBodySize(None)
-            self.heightSpin.SetValue(js.get('height', 9))
-            self.setHeight(None)
-
-            if not js.get('is_skeleton', False):
-                _torsoEvent = wx.FileDirPickerEvent()
-                _torsoEvent.SetPath(js.get('torso_texture', ''))
-                self.torsoTex.SetPath(js.get('torso_texture', ''))
-                self.setTorsoTex(_torsoEvent)
-
-                _armEvent = wx.FileDirPickerEvent()
-                _armEvent.SetPath(js.get('arm_texture', ''))
-                self.armTex.SetPath(js.get('arm_texture', ''))
-                self.setArmTex(_armEvent)
-
-                _legEvent = wx.FileDirPickerEvent()
-                _legEvent.SetPath(js.get('leg_texture', ''))
-                self.legTex.SetPath(js.get('leg_texture', ''))
-                self.setLegTex(_legEvent)
-
-                self.__setHandColor(*js.get('hand_color', (1, 1, 1, 1)))
-            self.__setBodyColor(*js.get('color_scale', (1, 1, 1, 1)))
-
-            self.nameInput.SetValue(js.get('name'))
-            self.nameSInput.SetValue(js.get('name_singular'))
-            self.namePInput.SetValue(js.get('name_plural'))
-            self.__updateNames(None)
-
-            self.cogPreview.setQuoteSets(js.get('quote_sets', []))
-
-        self.loadCog(None)
+        # The journal has edits that aren't in the file yet
+        js = self.journal.getDocument(filePath) if self.journal is not None else None
+        if js is None:
+            with open(filePath, 'r') as cog:
+                js = json.load(cog)
+        for head in js['head_models']:
+            self.addHead(head)
+
+        self.cogPreview.setSkeleton(js.get('is_skeleton', False))
+
+        self.bodyTypeSelection.Select(js.get('body_type', 0))
+        self.setBody(None)
+        self.bodyScale.SetValue(js.get('scale', 1))
+        self.setBodySize(None)
+        self.heightSpin.SetValue(js.get('height', 9))
+        self.setHeight(None)
+
+        if not js.get('is_skeleton', False):
+            _torsoEvent = wx.FileDirPickerEvent()
+            _torsoEvent.SetPath(js.get('torso_texture', ''))
+            self.torsoTex.SetPath(js.get('torso_texture', ''))
+            self.setTorsoTex(_torsoEvent)
+
+            _armEvent = wx.FileDirPickerEvent()
+            _armEvent.SetPath(js.get('arm_texture', ''))
+            self.armTex.SetPath(js.get('arm_texture', ''))
+            self.setArmTex(_armEvent)
+
+            _legEvent = wx.FileDirPickerEvent()
+            _legEvent.SetPath(js.get('leg_texture', ''))
+            self.legTex.SetPath(js.get('leg_texture', ''))
+            self.setLegTex(_legEvent)
+
+            self.__setHandColor(*js.get('hand_color', (1, 1, 1, 1)))
+        self.__setBodyColor(*js.get('color_scale', (1, 1, 1, 1)))
+
+        self.nameInput.SetValue(js.get('name'))
+        self.nameSInput.SetValue(js.get('name_singular'))
+        self.namePInput.SetValue(js.get('name_plural'))
+        self.__updateNames(None)
+
+        self.cogPreview.setQuoteSets(js.get('quote_sets', []))
+
+        if not reloading:
+            self.loadCog(None)
         self.updateHeads(None)
         self.cogPreview.activeCogFile = filePath
+        if self.journal is not None:
+            # Later edits are recorded against what the editor shows now
+            self.journal.track(filePath, self.cogPreview.toJson())
 
     def setupSettingsPage(self):
         # === Settings Page ===
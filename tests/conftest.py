@@ -0,0 +1,41 @@
+import itertools
+import os
+from typing import Dict
+
+import pytest
+from panda3d.core import Filename, Multifile
+
+
+@pytest.fixture
+def clientPath(tmp_path) -> str:
+    """
+    A fake Toontown Realms installation, findClientPaks looks for the paks under resources\\default\\
+    """
+    return f'{tmp_path}/client/'
+
+
+@pytest.fixture
+def makePak(clientPath, tmp_path):
+    """
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'data'}) writes (or replaces) a pak in the fake client
+    """
+    os.makedirs(clientPath, exist_ok = True)
+    sources = tmp_path / 'pak_sources'
+    sources.mkdir()
+    counter = itertools.count()
+
+    def make(pakName: str, subfiles: Dict[str, bytes]) -> str:
+        path = f'{clientPath}resources\\default\\{pakName}'
+        if os.path.exists(path):
+            os.unlink(path)
+        mf = Multifile()
+        mf.openWrite(Filename(path))
+        for name, data in subfiles.items():
+            source = sources / str(next(counter))
+            source.write_bytes(data)
+            mf.addSubfile(name, Filename.binaryFilename(str(source)), 0)
+        mf.flush()
+        mf.close()
+        return path
+
+    return make
@@ -0,0 +1,135 @@
+import copy
+import json
+
+import pytest
+
+from src.datapack.EditJournal import EditJournal
+
+
+@pytest.fixture
+def pack(tmp_path):
+    appearances = tmp_path / 'pack' / 'cogs' / 'appearance'
+    appearances.mkdir(parents = True)
+    return tmp_path / 'pack'
+
+
+@pytest.fixture
+def cogFile(pack):
+    path = pack / 'cogs' / 'appearance' / 'a.json'
+    path.write_text(json.dumps({'name': 'A', 'scale': 1.0, 'head_models': [{'path': 'p', 'texture': ''}]}))
+    return str(path)
+
+
+def openJournal(pack) -> EditJournal:
+    return EditJournal(str(pack), str(pack.parent / 'journal' / 'pack.jsonl'))
+
+
+def edit(journal: EditJournal, cogFile: str, **changes):
+    document = journal.getDocument(cogFile)
+    document.update(changes)
+    journal.record(cogFile, document)
+
+
+def readFile(cogFile: str) -> dict:
+    with open(cogFile, 'r') as file:
+        return json.load(file)
+
+
+def testUndoAndRedo(pack, cogFile, monkeypatch):
+    monkeypatch.setattr(EditJournal, 'MERGE_WINDOW', 0)
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    edit(journal, cogFile, scale = 2.0)
+    edit(journal, cogFile, name = 'B')
+
+    assert journal.undo() == ['cogs/appearance/a.json']
+    assert journal.getDocument(cogFile)['name'] == 'A'
+    assert journal.undo() == ['cogs/appearance/a.json']
+    assert journal.getDocument(cogFile)['scale'] == 1.0
+    assert not journal.canUndo()
+    assert journal.redo() == ['cogs/appearance/a.json']
+    assert journal.getDocument(cogFile) == {'name': 'A', 'scale': 2.0, 'head_models': [{'path': 'p', 'texture': ''}]}
+
+    # A new edit drops the redo history
+    edit(journal, cogFile, name = 'C')
+    assert not journal.canRedo()
+    journal.close()
+
+
+def testQuickEditsOfTheSameFieldMerge(pack, cogFile):
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    for scale in (1.1, 1.2, 1.3):
+        edit(journal, cogFile, scale = scale)
+    edit(journal, cogFile, name = 'B')
+
+    journal.undo()
+    journal.undo()
+    assert journal.getDocument(cogFile)['scale'] == 1.0
+    assert not journal.canUndo()
+    journal.close()
+
+
+def testHeadsAreDiffedFieldByField(pack, cogFile):
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    document = journal.getDocument(cogFile)
+    document['head_models'][0]['texture'] = 't.png'
+    journal.record(cogFile, document)
+
+    assert journal.undoStack[-1] == [('cogs/appearance/a.json', [{'path': ['head_models', 0, 'texture'], 'old': '', 'new': 't.png'}])]
+    journal.close()
+
+
+def testSnapshotWritesTheFiles(pack, cogFile):
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    edit(journal, cogFile, name = 'B')
+    assert readFile(cogFile)['name'] == 'A'
+
+    journal.snapshot()
+    assert journal.waitForSnapshot()
+    assert readFile(cogFile)['name'] == 'B'
+    journal.close()
+
+
+def testCrashRecovery(pack, cogFile, monkeypatch):
+    monkeypatch.setattr(EditJournal, 'MERGE_WINDOW', 0)
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    edit(journal, cogFile, scale = 2.0)
+    edit(journal, cogFile, name = 'B')
+    journal.undo()
+    # Crash before the snapshot, with the last line cut off halfway
+    journal.file.write('{"type": "edit", "se')
+    journal.file.close()
+
+    journal = openJournal(pack)
+    journal.waitForSnapshot()
+    assert readFile(cogFile) == {'name': 'A', 'scale': 2.0, 'head_models': [{'path': 'p', 'texture': ''}]}
+    assert len(journal.undoStack) == 1 and len(journal.redoStack) == 1
+    assert journal.redo() == ['cogs/appearance/a.json']
+    assert journal.getDocument(cogFile)['name'] == 'B'
+    journal.close()
+
+
+def testCompactionKeepsTheHistory(pack, cogFile, monkeypatch):
+    monkeypatch.setattr(EditJournal, 'MERGE_WINDOW', 0)
+    monkeypatch.setattr(EditJournal, 'COMPACT_LINES', 10)
+    monkeypatch.setattr(EditJournal, 'HISTORY_LIMIT', 3)
+    journal = openJournal(pack)
+    journal.track(cogFile, readFile(cogFile))
+    for i in range(12):
+        edit(journal, cogFile, scale = float(i))
+    journal.undo()
+    journal.snapshot()
+    assert journal.numLines < 10
+    expected = copy.deepcopy(journal.getDocument(cogFile))
+    journal.close()
+
+    journal = openJournal(pack)
+    assert readFile(cogFile) == expected
+    assert len(journal.undoStack) == 3 and len(journal.redoStack) == 1
+    journal.redo()
+    assert journal.getDocument(cogFile)['scale'] == 11.0
+    journal.close()
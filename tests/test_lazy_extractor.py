@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from src.base.ResourceExtractor import LazyResourceExtractor, findClientPaks
+from src.base.SubfileCatalog import SubfileCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = SubfileCatalog(str(tmp_path / 'catalog.db'))
+    yield catalog
+    catalog.close()
+
+
+def makeExtractor(clientPath: str, catalog: SubfileCatalog, outputPath: str) -> LazyResourceExtractor:
+    catalog.update(findClientPaks(clientPath))
+    extractor = LazyResourceExtractor(clientPath, outputPath, catalog)
+    extractor.prepare()
+    return extractor
+
+
+def testModelsBringTheirTextures(clientPath, makePak, catalog, tmp_path):
+    makePak('ttrm_mdl_1.pak', {'phase_3/models/m.bam': b'.. phase_3/maps/t.png ..', 'phase_3/maps/t.png': b'mdl'})
+    makePak('ttrm_tex_1.pak', {'phase_3/maps/t.png': b'tex'})
+    extractor = makeExtractor(clientPath, catalog, str(tmp_path / 'resources'))
+
+    assert extractor.ensure('phase_3/models/m')
+    assert not extractor.ensure('phase_3/models/missing')
+    with open(tmp_path / 'resources/phase_3/maps/t.png', 'rb') as file:
+        assert file.read() == b'tex'
+
+
+def testExtractionsSurviveACrash(clientPath, makePak, catalog, tmp_path):
+    makePak('ttrm_mdl_1.pak', {'phase_3/a.txt': b'a'})
+    outputPath = str(tmp_path / 'resources')
+    extractor = makeExtractor(clientPath, catalog, outputPath)
+    extractor.ensure('phase_3/a.txt')
+
+    # What the save window does once it's over, saveExtracted (on quit) is never called
+    assert extractor.autosave.isDirty()
+    extractor.autosave.save()
+    extractor.autosave.lastWrite.result()
+
+    extractor = makeExtractor(clientPath, catalog, outputPath)
+    assert 'phase_3/a.txt' in extractor.paks[os.path.basename(findClientPaks(clientPath)[0])]['subfiles']
+    assert os.path.isfile(os.path.join(outputPath, 'phase_3/a.txt'))
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.base.Localizer import LOCALIZER_FILES, LocalizerFetcher, LocalizerSnapshot, parseLocalizerFile
+
+LOCALIZER_TEXT = {
+    'otplocalizer.txt': "Hello = 'Hi'\n",
+    'ttlocalizer.txt': "#Cog = 'Flunky'\n",
+}
+
+
+class LocalizerServer:
+    """
+    Stands in for the localizer host, answering with an ETag and 304s for it
+    """
+
+    def __init__(self):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                filename = self.path.rsplit('/', 1)[-1]
+                etag = f'"{filename}-v1"'
+                server.requests.append((filename, self.headers.get('If-None-Match')))
+                if filename not in LOCALIZER_TEXT:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = LOCALIZER_TEXT[filename].encode('utf-8')
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpServer = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpServer.server_address[1]}/localizer/'
+        threading.Thread(target = self.httpServer.serve_forever, daemon = True).start()
+
+    def stop(self):
+        self.httpServer.shutdown()
+        self.httpServer.server_close()
+
+
+@pytest.fixture
+def server():
+    server = LocalizerServer()
+    yield server
+    server.stop()
+
+
+def fetch(cacheDirectory, url) -> dict:
+    return asyncio.run(LocalizerFetcher(str(cacheDirectory), url, timeout = 2).fetchAll())
+
+
+def testFirstFetchDownloads(server, tmp_path):
+    assert fetch(tmp_path, server.url) == {filename: True for filename in LOCALIZER_FILES}
+    assert sorted(server.requests) == [(filename, None) for filename in sorted(LOCALIZER_FILES)]
+    assert parseLocalizerFile(str(tmp_path / 'otplocalizer.txt')) == {'Hello': 'Hi'}
+    assert parseLocalizerFile(str(tmp_path / 'ttlocalizer.txt'), keyStart = 1) == {'Cog': 'Flunky'}
+
+
+def testWarmFetchSendsETags(server, tmp_path):
+    fetch(tmp_path, server.url)
+    server.requests.clear()
+    (tmp_path / 'otplocalizer.txt').write_text("Hello = 'Cached'\n")
+
+    assert fetch(tmp_path, server.url) == {filename: True for filename in LOCALIZER_FILES}
+    assert sorted(server.requests) == [(filename, f'"{filename}-v1"') for filename in sorted(LOCALIZER_FILES)]
+    # A 304 keeps the copy on disk
+    assert parseLocalizerFile(str(tmp_path / 'otplocalizer.txt')) == {'Hello': 'Cached'}
+
+
+def testOfflineUsesCachedCopy(server, tmp_path):
+    fetch(tmp_path, server.url)
+    server.stop()
+
+    assert fetch(tmp_path, server.url) == {filename: True for filename in LOCALIZER_FILES}
+    assert parseLocalizerFile(str(tmp_path / 'otplocalizer.txt')) == {'Hello': 'Hi'}
+
+
+def testOfflineWithoutCache(server, tmp_path):
+    server.stop()
+    assert fetch(tmp_path, server.url) == {filename: False for filename in LOCALIZER_FILES}
+
+
+def testMissingFileIsNotAvailable(server, tmp_path):
+    assert asyncio.run(LocalizerFetcher(str(tmp_path), server.url).fetchAll(('missing.txt',))) == {'missing.txt': False}
+
+
+def testSnapshotIsRebuiltWhenSourcesChange(tmp_path):
+    source = tmp_path / 'otplocalizer.txt'
+    source.write_text("Hello = 'Hi'\n")
+    snapshotPath = str(tmp_path / 'localizer.snapshot')
+
+    assert LocalizerSnapshot(snapshotPath, [str(source)]).load() is None
+    LocalizerSnapshot(snapshotPath, [str(source)]).save({'Hello': 'Hi'})
+    assert LocalizerSnapshot(snapshotPath, [str(source)]).load() == {'Hello': 'Hi'}
+
+    source.write_text("Hello = 'Hey'\n")
+    assert LocalizerSnapshot(snapshotPath, [str(source)]).load() is None
+
+
+def testSnapshotWithoutSources(tmp_path):
+    snapshotPath = tmp_path / 'localizer.snapshot'
+    snapshot = LocalizerSnapshot(str(snapshotPath), [str(tmp_path / 'TTLocalizerEnglish.py')])
+    assert snapshot.load() is None
+    snapshot.save({'Hello': 'Hi'})
+    assert not snapshotPath.exists()
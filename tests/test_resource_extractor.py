@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from src.base.ResourceExtractor import ResourceExtractor
+
+
+@pytest.fixture
+def extractor(clientPath, tmp_path) -> ResourceExtractor:
+    return ResourceExtractor(clientPath, str(tmp_path / 'resources'), workers = 2)
+
+
+def readOutput(extractor: ResourceExtractor, subfileName: str):
+    path = os.path.join(extractor.outputPath, subfileName)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def testLaterPakOverridesEarlierOne(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl', 'phase_3/a.txt': b'a'})
+    makePak('ttrm_tex_1.pak', {'phase_3/x.txt': b'tex'})
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'tex'
+    assert readOutput(extractor, 'phase_3/a.txt') == b'a'
+
+
+def testDroppedOverrideIsExtractedFromEarlierPak(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl'})
+    makePak('ttrm_tex_1.pak', {'phase_3/x.txt': b'tex'})
+    extractor.extract()
+
+    # Only the later pak changes, the earlier one has to give its copy back
+    makePak('ttrm_tex_1.pak', {'phase_3/y.txt': b'y'})
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'mdl'
+    assert readOutput(extractor, 'phase_3/y.txt') == b'y'
+
+
+def testChangedEarlierPakKeepsLaterOverride(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl'})
+    makePak('ttrm_tex_1.pak', {'phase_3/x.txt': b'tex'})
+    extractor.extract()
+
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl changed', 'phase_3/a.txt': b'a'})
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'tex'
+    assert readOutput(extractor, 'phase_3/a.txt') == b'a'
+
+
+def testNewOverrideReplacesExtractedCopy(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl'})
+    makePak('ttrm_tex_1.pak', {'phase_3/y.txt': b'y'})
+    extractor.extract()
+
+    makePak('ttrm_tex_1.pak', {'phase_3/x.txt': b'tex', 'phase_3/y.txt': b'y'})
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'tex'
+
+
+def testRemovedPakGivesBackOverriddenSubfiles(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'mdl'})
+    texPak = makePak('ttrm_tex_1.pak', {'phase_3/x.txt': b'tex'})
+    extractor.extract()
+
+    os.unlink(texPak)
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'mdl'
+
+
+def testDeletedSubfilesArePruned(extractor, makePak):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'x', 'phase_4/gone.txt': b'gone'})
+    extractor.extract()
+
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'x'})
+    extractor.extract()
+    assert readOutput(extractor, 'phase_4/gone.txt') is None
+    assert not os.path.exists(os.path.join(extractor.outputPath, 'phase_4'))
+    assert readOutput(extractor, 'phase_3/x.txt') == b'x'
+
+
+def testUnchangedPaksAreNotExtractedAgain(extractor, makePak, monkeypatch):
+    makePak('ttrm_mdl_1.pak', {'phase_3/x.txt': b'x'})
+    extractor.extract()
+
+    def failScan(*args):
+        raise AssertionError('nothing should be scanned')
+
+    monkeypatch.setattr('src.base.ResourceExtractor.scanPak', failScan)
+    extractor.extract()
+    assert readOutput(extractor, 'phase_3/x.txt') == b'x'
+
+
+def testBigPaksAreSplitBetweenWorkers(extractor, makePak, monkeypatch):
+    monkeypatch.setattr(ResourceExtractor, 'CHUNK_MAX_SUBFILES', 2)
+    subfiles = {f'phase_3/{i}.txt': str(i).encode() for i in range(7)}
+    makePak('ttrm_mdl_1.pak', subfiles)
+
+    progress = []
+    extractor.extract(lambda done, total: progress.append((done, total)))
+    assert all(readOutput(extractor, name) == data for name, data in subfiles.items())
+    assert progress[-1] == (7, 7)
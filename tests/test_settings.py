@@ -0,0 +1,57 @@
+import pytest
+import toml
+
+from src.ott.Settings import Settings
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, 'WATCH_INTERVAL', 0)
+    settings = Settings(str(tmp_path / 'settings.toml'))
+    yield settings
+    settings.flush()
+
+
+def writePending(settings: Settings):
+    # What the save window does once it's over
+    settings.autosave.save()
+    settings.autosave.lastWrite.result()
+
+
+def testBatchSavesOnce(settings, tmp_path):
+    with settings.batch():
+        settings['a'] = 1
+        with settings.batch():
+            settings['b'] = 2
+        assert not settings.autosave.isDirty()
+    assert settings.autosave.isDirty()
+    assert settings.changeCount == 2
+
+    writePending(settings)
+    assert toml.load(str(tmp_path / 'settings.toml')) == {'a': 1, 'b': 2}
+
+
+def testOwnWritesAreNotReloaded(settings, monkeypatch):
+    settings['a'] = 1
+    writePending(settings)
+
+    def failLoad():
+        raise AssertionError('the file was parsed again')
+
+    monkeypatch.setattr(settings, 'load', failLoad)
+    assert settings['a'] == 1
+
+
+def testOutsideEditsAreReloaded(settings, tmp_path):
+    settings['a'] = 1
+    writePending(settings)
+
+    (tmp_path / 'settings.toml').write_text('a = 5\n')
+    assert settings['a'] == 5
+    assert 'a' in settings and len(settings) == 1
+
+
+def testPendingChangesWinOverOutsideEdits(settings, tmp_path):
+    settings['a'] = 1
+    (tmp_path / 'settings.toml').write_text('a = 5\n')
+    assert settings['a'] == 1
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from src.base.ResourceExtractor import findClientPaks
+from src.base.SubfileCatalog import SubfileCatalog
+
+
+@pytest.fixture
+def catalog(clientPath, makePak, tmp_path):
+    makePak('ttrm_mdl_1.pak', {
+        'phase_3/data/cogs/appearance/a.json': b'{}',
+        'phase_3/data/cogs/appearance/sub/b.json': b'{}',
+        'phase_3/models/m.bam': b'bam',
+        'phase_3/maps/t.png': b'mdl',
+    })
+    makePak('ttrm_tex_1.pak', {'phase_3.5/maps/Foo.PNG': b'foo', 'phase_3/maps/t.png': b'tex'})
+    catalog = SubfileCatalog(str(tmp_path / 'catalog.db'))
+    catalog.update(findClientPaks(clientPath))
+    yield catalog
+    catalog.close()
+
+
+def testQueries(catalog):
+    assert catalog.query(pattern = 'phase_3/data/cogs/appearance/*.json') == [
+        'phase_3/data/cogs/appearance/a.json', 'phase_3/data/cogs/appearance/sub/b.json']
+    assert catalog.query(directory = 'phase_3/data/cogs/appearance/', extensions = ('json',)) == ['phase_3/data/cogs/appearance/a.json']
+    assert catalog.query(prefix = 'phase_3/', extensions = ('PNG',)) == ['phase_3/maps/t.png']
+    assert catalog.query(contains = 'foo') == ['phase_3.5/maps/Foo.PNG']
+    assert catalog.query(phases = ('phase_3.5',)) == ['phase_3.5/maps/Foo.PNG']
+    assert catalog.query(prefix = 'phase_3/', limit = 2) == ['phase_3/data/cogs/appearance/a.json',
+                                                              'phase_3/data/cogs/appearance/sub/b.json']
+    assert catalog.getPhases() == ['phase_3', 'phase_3.5']
+    assert catalog.getNumSubfiles() == 5
+
+
+def testLaterPaksWin(catalog):
+    entry = catalog.lookup('phase_3/maps/t.png')
+    assert entry.pak.endswith('ttrm_tex_1.pak')
+    assert entry.size == 3 and entry.extension == 'png'
+    assert catalog.lookup('phase_3/missing.png') is None
+
+
+def testOnlyChangedPaksAreRescanned(catalog, clientPath, makePak, monkeypatch):
+    scanned = []
+    scanPak = SubfileCatalog.scanPak
+
+    def recordScan(multifile, pakName):
+        scanned.append(pakName)
+        return scanPak(multifile, pakName)
+
+    monkeypatch.setattr(SubfileCatalog, 'scanPak', staticmethod(recordScan))
+
+    catalog.update(findClientPaks(clientPath))
+    assert scanned == []
+
+    makePak('ttrm_tex_1.pak', {'phase_3.5/maps/Foo.PNG': b'foo'})
+    catalog.update(findClientPaks(clientPath))
+    assert scanned == [os.path.basename(findClientPaks(clientPath)[1])]
+    # The override is gone, so the earlier pak's copy shows through again
+    assert catalog.lookup('phase_3/maps/t.png').pak.endswith('ttrm_mdl_1.pak')
+
+
+def testRemovedPaksAreDropped(catalog, clientPath):
+    os.unlink(findClientPaks(clientPath)[1])
+    catalog.update(findClientPaks(clientPath))
+    assert catalog.query(phases = ('phase_3.5',)) == []
+    assert catalog.lookup('phase_3/maps/t.png').pak.endswith('ttrm_mdl_1.pak')